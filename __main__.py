@@ -3,46 +3,295 @@ import sys
 import argparse
 import json
 import os
+import subprocess
 from call_tree import CallTree, ProjectAnalyzer
+import worker
 
 
 class OutputFormat(IntEnum):
     HTML = auto()
     JSON = auto()
     VISJS = auto()
+    SHARDED = auto()
+    NPZ = auto()
+    INCLUDES = auto()
 
 
 parser = argparse.ArgumentParser(
     description="Analyze function call tree in a project.")
-parser.add_argument("project_directory",
+parser.add_argument("project_directory", nargs="?",
                     help="Directory containing the project source files")
 parser.add_argument("-o", choices=[f.name.lower()
-                    for f in OutputFormat], help="Output format (html, json, visjs)")
+                    for f in OutputFormat], help="Output format (html, json, visjs, sharded, npz, includes)")
+parser.add_argument("--shard-by", choices=["module", "function"], default="module",
+                    help="Page granularity of the sharded HTML export")
+parser.add_argument("--sites", metavar="FUNCTION",
+                    help="List all call sites of the given function")
+parser.add_argument("--diff", nargs=2, metavar=("OLD_JSON", "NEW_JSON"),
+                    help="Compare two saved calltree.json files and write only the delta")
+parser.add_argument("--since", metavar="REV",
+                    help="Only re-parse translation units affected by changes since the given git revision")
+parser.add_argument("--previous", metavar="JSON",
+                    help="Saved graph to patch with --since (default: <project_directory>/calltree.json)")
+parser.add_argument("--pipeline", action="store_true",
+                    help="Overlap discovery, parsing and writing, streaming edges as each file finishes")
+parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                    help="Number of parallel parse workers for --pipeline and --unit-timeout/--unit-memory")
+parser.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                    help="Skip files and directories matching a .gitignore-style glob (repeatable)")
+parser.add_argument("--respect-gitignore", action="store_true",
+                    help="Also skip what the project's top-level .gitignore ignores")
+parser.add_argument("--max-memory", type=int, metavar="MB",
+                    help="Free each translation unit after its walk and spill call sites to disk near this RSS limit")
+parser.add_argument("--unit-timeout", type=float, metavar="SECONDS",
+                    help="Parse in supervised worker processes, killing any translation unit that takes longer")
+parser.add_argument("--unit-memory", type=int, metavar="MB",
+                    help="Parse in supervised worker processes, killing any translation unit whose RSS grows by more than this")
+parser.add_argument("--retry-reduced", action="store_true",
+                    help="Retry killed translation units without the preprocessing record, then without function bodies")
+parser.add_argument("--compress", action="store_true",
+                    help="Write calltree.json.gz and HTML with gzip-compressed embedded data")
+parser.add_argument("--stack-usage", nargs="+", metavar="SU_PATH",
+                    help="GCC -fstack-usage .su files or directories; report worst-case stack per entry point")
+parser.add_argument("--entry", action="append", default=[], metavar="FUNCTION",
+                    help="Entry point for --stack-usage and --impact (repeatable, default: functions nobody calls)")
+parser.add_argument("--impact", nargs="+", metavar="FILE:START-END",
+                    help="Report the entry points affected by changes to these line ranges")
+parser.add_argument("--impact-diff", metavar="PATCH",
+                    help="Unified diff (- for stdin) whose changed lines are analyzed like --impact")
+parser.add_argument("--engine", choices=["libclang", "index", "fast"], default="libclang",
+                    help="Extraction engine; 'index' uses libclang's indexer callbacks instead of a "
+                         "cursor walk, 'fast' tokenizes sources heuristically without libclang")
+parser.add_argument("--compare-engines", action="store_true",
+                    help="Time every engine on the project and score it against libclang")
+parser.add_argument("--batch", nargs="+", metavar="ROOT",
+                    help="Analyze several project roots (or @file listing one per line) in one process")
+parser.add_argument("--combined", action="store_true",
+                    help="With --batch, also write one graph of all roots as calltree_combined.*")
+parser.add_argument("--combined-out", default=os.curdir, metavar="DIR",
+                    help="Directory of the --combined graph (default: the current directory)")
+parser.add_argument("--variant", action="append", default=[], metavar="NAME:DEFINE[,DEFINE...]",
+                    help="Preprocessor variant to analyze (repeatable); edges record the variants they appear in")
+parser.add_argument("--variant-view", metavar="NAME",
+                    help="With --variant, output the graph of one variant instead of the union")
+parser.add_argument("--serve", action="store_true",
+                    help="Run a resident worker that keeps libclang and parsed projects warm for later invocations")
+parser.add_argument("--port", type=int, default=worker.DEFAULT_PORT,
+                    help="Localhost port of the resident worker")
+parser.add_argument("--use-worker", action="store_true",
+                    help="Run in the resident worker started with --serve, if one is running for this user")
+parser.add_argument("--root", action="append", default=[], metavar="FUNCTION",
+                    help="Print only the tree under this function (repeatable)")
+parser.add_argument("--depth", type=int, metavar="N",
+                    help="Expand the printed tree at most N calls deep")
+parser.add_argument("--metrics", nargs="?", const="betweenness", metavar="SORT_BY",
+                    choices=["fan_in", "fan_out", "reach", "betweenness"],
+                    help="Rank functions by fan-in, fan-out, reach and betweenness (sorted by SORT_BY, default "
+                         "betweenness) and size the nodes of -o html/sharded/visjs by that metric")
+parser.add_argument("--top", type=int, default=20, metavar="N",
+                    help="Number of functions printed by --metrics")
+parser.add_argument("--samples", type=int, default=256, metavar="N",
+                    help="Source functions sampled to estimate betweenness for --metrics")
+parser.add_argument("--summarize-lib", action="store_true",
+                    help="Analyze the directory as a library and save calltree_summary.json for --lib")
+parser.add_argument("--lib", action="append", default=[], metavar="SUMMARY",
+                    help="Library summary (file or directory) to stitch calls through instead of parsing it (repeatable)")
 args = parser.parse_args()
 
+# Only one option of each group takes effect, and the standalone modes exclude the rest
+standalone = [name for name, given in (("--serve", args.serve), ("--diff", args.diff), ("--batch", args.batch),
+                                        ("--compare-engines", args.compare_engines)) if given]
+builds = [name for name, given in (("--since", args.since), ("--variant", args.variant),
+                                    ("--engine", args.engine != "libclang"), ("--max-memory", args.max_memory),
+                                    ("--unit-timeout/--unit-memory", args.unit_timeout or args.unit_memory),
+                                    ("--pipeline", args.pipeline)) if given]
+reports = [name for name, given in (("--sites", args.sites), ("--stack-usage", args.stack_usage),
+                                     ("--impact/--impact-diff", args.impact or args.impact_diff),
+                                     ("--metrics", args.metrics), ("--summarize-lib", args.summarize_lib)) if given]
+for group in (standalone, builds, reports):
+    if len(group) > 1:
+        parser.error(f"{group[0]} cannot be combined with {group[1]}")
+if standalone and builds + reports:
+    parser.error(f"{standalone[0]} cannot be combined with {(builds + reports)[0]}")
+if args.serve and args.use_worker:
+    parser.error("--serve cannot be combined with --use-worker")
+
+if args.serve:
+    worker.Worker(args.port).serve()
+    sys.exit(0)
+if worker.WORKER is None and args.use_worker:
+    status = worker.forward(sys.argv[1:], args.port)
+    if status is not None:
+        sys.exit(status)
+
+
+def write_output(call_tree: CallTree, output_format: OutputFormat) -> None:
+    match output_format:
+        case OutputFormat.HTML:
+            call_tree.to_html(args.compress)
+        case OutputFormat.SHARDED:
+            call_tree.to_sharded_html(args.shard_by, args.compress)
+        case OutputFormat.NPZ:
+            call_tree.to_npz(args.compress)
+        case OutputFormat.JSON:
+            call_tree.to_json(args.compress)
+        case OutputFormat.INCLUDES:
+            call_tree.to_includes()
+        case OutputFormat.VISJS:
+            visjs_data = call_tree.to_visjs()
+            visjs_filepath = call_tree.output_path("_visjs.json")
+            with open(visjs_filepath, "w") as f:
+                json.dump(visjs_data, f, indent=4)
+            print(f"Vis.js data saved at {visjs_filepath}")
+        case _:
+            roots = call_tree.entry_points(args.root) if args.root else None
+            if roots == []:
+                print(f"[WARNING] no function named {', '.join(args.root)}", file=sys.stderr)
+            call_tree.print(roots, args.depth)
+
+
+if args.diff:
+    from graph_diff import write_diff
+    try:
+        write_diff(*args.diff, args.project_directory or os.path.dirname(args.diff[1]))
+    except ValueError as error:
+        parser.error(str(error))
+    sys.exit(0)
+if args.batch:
+    from batch import BatchAnalyzer, read_roots
+    batch = BatchAnalyzer(read_roots(args.batch), args.exclude, args.combined, args.combined_out,
+                          args.respect_gitignore)
+    batch_format = OutputFormat[args.o.upper()] if args.o else OutputFormat.JSON
+    for call_tree in batch.run():
+        write_output(call_tree, batch_format)
+    if batch.combined is not None:
+        write_output(batch.combined, batch_format)
+    sys.exit(0)
+if not args.project_directory:
+    parser.error("the following arguments are required: project_directory")
+
 project_directory: str = args.project_directory
+if not os.path.isdir(project_directory):
+    parser.error(f"project directory not found: {project_directory}")
+if args.variant_view:
+    if not args.variant:
+        parser.error("--variant-view requires --variant")
+    from variants import Variant
+    variant_names = [Variant(spec).name for spec in args.variant]
+    if args.variant_view not in variant_names:
+        parser.error(f"unknown variant {args.variant_view} for --variant-view (choose from {', '.join(variant_names)})")
+
+if args.compare_engines:
+    import engines
+    engines.compare(project_directory, list(engines.ENGINES))
+    sys.exit(0)
 output_format = OutputFormat[args.o.upper()] if args.o else None
 
-analyzer = ProjectAnalyzer(project_directory)
-call_tree = CallTree(project_directory)
+analyzer = ProjectAnalyzer(project_directory, args.exclude, respect_gitignore=args.respect_gitignore)
+
+libraries = []
+if args.lib:
+    from lib_summary import load_summaries, exported_usrs, stitch
+    libraries = load_summaries(args.lib)
+
+
+def new_tree() -> CallTree:
+    call_tree = CallTree(project_directory)
+    if libraries:
+        call_tree.library_usrs = exported_usrs(libraries)
+    return call_tree
+
+
+if args.since:
+    from incremental import update_since
+    previous = os.path.join(project_directory, "calltree.json")
+    if not os.path.exists(previous) and os.path.exists(previous + ".gz"):
+        previous += ".gz"
+    previous = args.previous or previous
+    if not os.path.exists(previous):
+        parser.error(f"no saved graph to patch at {previous}, run once with -o json or pass --previous")
+    call_tree = CallTree.load(previous, project_directory)
+    if call_tree.keyed_by_name:
+        parser.error(f"{previous} was saved without USRs, rebuild required: run once without --since")
+    call_tree.library_usrs = new_tree().library_usrs
+    try:
+        update_since(call_tree, analyzer, args.since)
+    except subprocess.CalledProcessError as error:
+        parser.error(f"git diff against {args.since} failed: {error.stderr.strip()}")
+elif args.variant:
+    from variants import Variant, VariantAnalyzer
+    variant_analyzer = VariantAnalyzer(analyzer, [Variant(spec) for spec in args.variant])
+    variant_analyzer.call_tree.library_usrs = new_tree().library_usrs
+    call_tree = variant_analyzer.build()
+    if args.variant_view:
+        call_tree = call_tree.view(args.variant_view)
+elif args.engine != "libclang":
+    import engines
+    call_tree = new_tree()
+    engines.build(args.engine, analyzer, call_tree)
+elif args.max_memory:
+    from bounded import build_bounded
+    call_tree = new_tree()
+    build_bounded(analyzer, call_tree, args.max_memory)
+elif args.unit_timeout or args.unit_memory:
+    from parse_watchdog import Watchdog
+    call_tree = new_tree()
+    Watchdog(analyzer, call_tree, args.unit_timeout, args.unit_memory, args.jobs, args.retry_reduced).build()
+elif args.pipeline:
+    import pipeline
+    call_tree = new_tree()
+    pipeline.build(analyzer, call_tree, args.jobs)
+elif worker.WORKER is not None:
+    call_tree = new_tree()
+    worker.WORKER.build(analyzer, call_tree)
+else:
+    call_tree = new_tree()
+    for source_file in analyzer.get_source_files():
+        tu = analyzer.get_translation_unit(source_file)
+        if tu:
+            call_tree.build(tu)
+
+
+if libraries:
+    stitch(call_tree, libraries)
+
+if args.summarize_lib:
+    from lib_summary import write_summary
+    write_summary(call_tree)
+    sys.exit(0)
+
+if args.sites:
+    for callee in call_tree.find(args.sites):
+        for caller, file, line, column in call_tree.call_sites(callee):
+            print(f"{file}:{line}:{column}: {caller.name} -> {callee.name}")
+    sys.exit(0)
+
+if args.stack_usage or args.impact or args.impact_diff:
+    for name in args.entry:
+        if not call_tree.find(name):
+            print(f"[WARNING] no function named {name} for --entry", file=sys.stderr)
+
+if args.stack_usage:
+    from stack_usage import write_stack_report
+    write_stack_report(call_tree, args.stack_usage, args.entry)
+    sys.exit(0)
 
-for source_file in analyzer.get_source_files():
-    tu = analyzer.get_translation_unit(source_file)
-    if tu:
-        call_tree.build(tu)
+if args.impact or args.impact_diff:
+    from impact import parse_ranges, parse_diff, write_impact_report
+    ranges = parse_ranges(args.impact or [])
+    if args.impact_diff:
+        with (sys.stdin if args.impact_diff == "-" else open(args.impact_diff)) as patch:
+            ranges += parse_diff(patch.read())
+    write_impact_report(call_tree, ranges, call_tree.entry_points(args.entry))
+    sys.exit(0)
 
+if args.metrics:
+    import metrics
+    values = metrics.compute(call_tree, args.samples)
+    metrics.write_metrics(call_tree, values, args.metrics, args.top)
+    if output_format is None:
+        sys.exit(0)
+    call_tree.node_sizes = metrics.node_sizes(values[args.metrics])
 
 # Handle output
-match output_format:
-    case OutputFormat.HTML:
-        call_tree.to_html()
-    case OutputFormat.JSON:
-        call_tree.to_json()
-    case OutputFormat.VISJS:
-        visjs_data = call_tree.to_visjs()
-        with open(os.path.join(project_directory, "calltree_visjs.json"), "w") as f:
-            json.dump(visjs_data, f, indent=4)
-        print(
-            f"Vis.js data saved at {os.path.join(project_directory, 'calltree_visjs.json')}")
-    case _:
-        call_tree.print()
+write_output(call_tree, output_format)
@@ -0,0 +1,156 @@
+import os
+import re
+from ctypes import byref, cast, c_void_p
+from typing import List, Dict, Optional, Set
+from clang.cindex import Cursor, CursorKind, File, Index, TranslationUnit, c_object_p, conf
+from call_tree import CallTree, UnitRecords
+from project import ProjectAnalyzer
+
+
+CONDITIONAL = re.compile(rb'^[ \t]*#[ \t]*(if|ifdef|ifndef|elif|else|endif)\b[ \t]*(\w*)', re.MULTILINE)
+
+
+class _UnfilteredTree(CallTree):
+    """Walks every function, so cached header records can be filtered per project later."""
+
+    def __init__(self):
+        super().__init__(os.sep)
+
+    def _is_in_project(self, file_path: Optional[str]) -> bool:
+        return file_path is not None
+
+
+def _guard_only(path: str) -> bool:
+    """Check that a header has no preprocessor conditionals besides its include guard."""
+    try:
+        with open(path, "rb") as header:
+            text = header.read()
+    except OSError:
+        return False
+    directives = CONDITIONAL.findall(text)
+    if not directives:
+        return True
+    if [directive for directive, _ in directives] != [b"ifndef", b"endif"]:
+        return False
+    return re.search(rb'^[ \t]*#[ \t]*define[ \t]+' + re.escape(directives[0][1]) + rb'\b', text,
+                     re.MULTILINE) is not None
+
+
+def _file_handle(cursor: Cursor) -> Optional[c_object_p]:
+    """Return the libclang file a cursor starts in, without converting its name."""
+    handle = c_object_p()
+    conf.lib.clang_getInstantiationLocation(cursor.location, byref(handle), None, None, None)
+    return handle or None
+
+
+class BatchAnalyzer:
+    """
+    Analyze many project roots in one process.
+
+    All roots parse with one Index, and the top-level declarations of a header are
+    walked only once when they cannot expand differently in another translation
+    unit: the header has no conditionals besides its include guard, and it either
+    expands no macros or has no function bodies (a body may call through macros of
+    the including unit). The records of such headers are cached by file and replayed
+    into each later translation unit that includes them; every other header is
+    walked again in each unit. Each
+    translation unit is extracted once and then filtered into the graph of its root
+    and, optionally, into a combined graph of all roots, written to `combined_out`.
+    """
+
+    def __init__(self, roots: List[str], excludes: Optional[List[str]] = None, combined: bool = False,
+                 combined_out: str = os.curdir, respect_gitignore: bool = False):
+        self.roots: List[str] = roots
+        self.index: Index = Index.create()
+        self.analyzers: List[ProjectAnalyzer] = [ProjectAnalyzer(root, excludes, self.index, respect_gitignore)
+                                                   for root in roots]
+        self.trees: List[CallTree] = [CallTree(root) for root in roots]
+        self.combined: Optional[CallTree] = None
+        if combined:
+            # Written under its own name, so it never replaces the graph of a root
+            self.combined = CallTree(combined_out)
+            self.combined.output_name = "calltree_combined"
+        self.headers: Dict[str, UnitRecords] = {}
+        # Headers found to expand per translation unit, never cached
+        self.unstable: Set[str] = set()
+        self._walker = _UnfilteredTree()
+
+    def _in_any_root(self, file_path: Optional[str]) -> bool:
+        return any(tree.in_project(file_path) for tree in self.trees)
+
+    def extract(self, translation_unit: TranslationUnit) -> UnitRecords:
+        """
+        Walk a translation unit into unfiltered records, replaying the cached records
+        of headers walked before instead of visiting their declarations again.
+        """
+        main_file = translation_unit.spelling
+        records = UnitRecords(main_file)
+        walked: Dict[str, UnitRecords] = {}
+        replayed: Set[str] = set()
+        expanding: Set[str] = set()
+        # Header keys by file handle address; None for the main file and built-ins
+        keys: Dict[Optional[int], Optional[str]] = {None: None}
+        for child in translation_unit.cursor.get_children():
+            handle = _file_handle(child)
+            address = cast(handle, c_void_p).value if handle else None
+            if address not in keys:
+                name = File(handle).name
+                # Roots often reach shared headers through different relative paths
+                keys[address] = None if name == main_file else os.path.abspath(name)
+            file = keys[address]
+            if file is not None and child.kind == CursorKind.MACRO_INSTANTIATION:
+                expanding.add(file)
+            if file is None or file in self.unstable:
+                self._walker.walk(child, translation_unit.cursor, records)
+                continue
+            if file in self.headers:
+                if file not in replayed:
+                    replayed.add(file)
+                    records.definitions += self.headers[file].definitions
+                    records.calls += self.headers[file].calls
+            else:
+                # Headers may be entered several times (A includes B midway), keep appending
+                chunk = UnitRecords(file)
+                self._walker.walk(child, translation_unit.cursor, chunk)
+                chunk.release()
+                header = walked.setdefault(file, UnitRecords(file))
+                header.definitions += chunk.definitions
+                header.calls += chunk.calls
+                records.definitions += chunk.definitions
+                records.calls += chunk.calls
+        records.release()
+        records.includes = self._walker.inclusions(translation_unit)
+        for file, header in walked.items():
+            bodies = bool(header.definitions or header.calls)
+            if _guard_only(file) and not (bodies and file in expanding):
+                self.headers[file] = header
+            else:
+                self.unstable.add(file)
+        return records
+
+    def run(self) -> List[CallTree]:
+        """Build the graph of every root (and the combined graph) and return the per-root graphs."""
+        for analyzer, call_tree in zip(self.analyzers, self.trees):
+            for source_file in analyzer.get_source_files():
+                tu = analyzer.get_translation_unit(source_file)
+                if not tu:
+                    continue
+                records = self.extract(tu)
+                call_tree.merge(records.copy(call_tree.in_project))
+                if self.combined is not None:
+                    self.combined.merge(records.copy(self._in_any_root))
+            print(f"{analyzer.project_root}: {len(call_tree.symbols)} functions, "
+                  f"{len(self.headers)} headers cached")
+        return self.trees
+
+
+def read_roots(paths: List[str]) -> List[str]:
+    """Expand `@file` arguments (one root per line) into the list of project roots."""
+    roots: List[str] = []
+    for path in paths:
+        if path.startswith('@'):
+            with open(path[1:]) as roots_file:
+                roots.extend(line.strip() for line in roots_file if line.strip() and not line.startswith('#'))
+        else:
+            roots.append(path)
+    return roots
@@ -0,0 +1,118 @@
+import os
+import sys
+import ctypes
+import tempfile
+import subprocess
+from typing import Optional
+from call_tree import CallTree
+from project import ProjectAnalyzer
+
+
+def current_rss(pid: Optional[int] = None) -> int:
+    """Return the resident set size of this process (or of `pid`) in bytes, or 0 if unknown."""
+    if sys.platform.startswith("linux"):
+        try:
+            with open(f"/proc/{pid or 'self'}/statm") as statm:
+                return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except OSError:
+            # The process already exited
+            return 0
+    if sys.platform == "win32":
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", ctypes.c_ulong), ("PageFaultCount", ctypes.c_ulong),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        kernel32 = ctypes.windll.kernel32
+        if pid is None:
+            process = kernel32.GetCurrentProcess()
+        else:
+            kernel32.OpenProcess.restype = ctypes.c_void_p
+            # PROCESS_QUERY_LIMITED_INFORMATION | PROCESS_VM_READ
+            process = kernel32.OpenProcess(0x1000 | 0x0010, False, pid)
+            if not process:
+                return 0
+            process = ctypes.c_void_p(process)
+        try:
+            if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+            return 0
+        finally:
+            if pid is not None:
+                kernel32.CloseHandle(process)
+    if pid is not None:
+        # macOS and other POSIX systems have no /proc, ps reports KiB
+        try:
+            output = subprocess.run(["ps", "-o", "rss=", "-p", str(pid)], capture_output=True, text=True).stdout
+            return int(output.strip() or 0) * 1024
+        except (OSError, ValueError):
+            return 0
+    import resource
+    # Peak rather than current RSS, in KiB on Linux but bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+class MemoryMonitor:
+    """
+    Track the peak RSS of the process against a configurable limit.
+
+    Freed memory is rarely returned to the OS, so the RSS stays near the threshold
+    after a spill. The first spill is triggered by the RSS; its run size (in call
+    sites) then paces the later spills, as the freed space holds about that many.
+    """
+
+    def __init__(self, limit_mb: int, headroom: float = 0.8):
+        self.limit: int = limit_mb * 1024 * 1024
+        self.threshold: int = int(self.limit * headroom)
+        self.peak: int = 0
+        self.run_sites: Optional[int] = None
+
+    def sample(self) -> int:
+        """Measure the current RSS and update the peak."""
+        rss = current_rss()
+        self.peak = max(self.peak, rss)
+        return rss
+
+    def should_spill(self, sites: int) -> bool:
+        """Return True when the `sites` call sites in memory should be spilled."""
+        rss = self.sample()
+        if self.run_sites is None:
+            if rss < self.threshold:
+                return False
+            self.run_sites = max(sites, 1)
+        return sites >= self.run_sites
+
+
+def build_bounded(analyzer: ProjectAnalyzer, call_tree: CallTree, limit_mb: int) -> None:
+    """
+    Build the call tree while keeping the RSS under `limit_mb`.
+
+    Each translation unit is turned into plain records and disposed right after its
+    walk. When the RSS nears the limit, accumulated call sites are spilled to an
+    on-disk run file, and again each time as many have accumulated. The runs are
+    merged back in memory once all files are processed, so the limit bounds the
+    parsing phase; the final graph needs its full size for the writers.
+    """
+    monitor = MemoryMonitor(limit_mb)
+    spills = 0
+    with tempfile.TemporaryFile(prefix="calltree-", suffix=".run") as run_file:
+        for source_file in analyzer.iter_source_files():
+            tu = analyzer.get_translation_unit(source_file)
+            if tu is None:
+                continue
+            records = call_tree.extract(tu)
+            del tu
+            call_tree.merge(records)
+            del records
+            if monitor.should_spill(len(call_tree.sites)):
+                call_tree.spill(run_file)
+                spills += 1
+        build_peak = monitor.peak
+        if spills:
+            call_tree.restore(run_file)
+    monitor.sample()
+    print(f"Peak RSS {build_peak / (1024 * 1024):.1f} MB of {limit_mb} MB while parsing, "
+          f"{monitor.peak / (1024 * 1024):.1f} MB after merging {spills} spills")
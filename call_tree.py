@@ -1,39 +1,74 @@
 import os
+import re
+import copy
 import sys
+import gzip
+import html
 import json
-from collections import defaultdict
-from typing import List, Set, Dict, Optional
+from collections import Counter, defaultdict
+from typing import BinaryIO, Callable, List, Set, Dict, Optional, TextIO, Tuple
 from clang.cindex import Index, Cursor, CursorKind, TranslationUnit, Config, SourceLocation
 from project import ProjectAnalyzer
-from template import HTML_TEMPLATE, JSON_REPLACE_HINT
+from symbols import FunctionInfo, SymbolTable
+from callsites import CallSiteStore
+from includes import IncludeGraph
+from schema import CompactWriter, compact, predates_usrs, read_functions, upgrade
+from template import INDEX_TEMPLATE, PAGE_LIST_REPLACE_HINT, render_html
 
 
-class FunctionInfo:
-    def __init__(self, cursor: Cursor):
-        if hasattr(cursor, 'spelling'):
-            self.name: str = cursor.spelling
-            self.file: str = cursor.location.file.name
-            self.line: int = cursor.location.line
-            self.column: int = cursor.location.column
-        else:
-            self.name: str = cursor.name
-            self.file: str = cursor.file
-            self.line: int = cursor.line
-            self.column: int = cursor.column
+FUNC_KINDS: List[CursorKind] = [
+    CursorKind.FUNCTION_DECL,
+    CursorKind.CXX_METHOD,
+    CursorKind.CONSTRUCTOR,
+    CursorKind.DESTRUCTOR
+]
+
+CallRecord = Tuple[FunctionInfo, FunctionInfo, str, int, int]
+
+PRINT_BUFFER_LINES = 8192
+
+
+class UnitRecords:
+    """
+    Plain records extracted from one translation unit: the functions it defines, its
+    (caller, callee, file, line, column) calls and its (includer, included) project
+    includes. Holds no libclang objects.
+    """
 
-    def __repr__(self) -> str:
-        return f"{self.name} {self.file}:{self.line}:{self.column}"
+    def __init__(self, source_file: str):
+        self.source_file: str = source_file
+        self.definitions: List[FunctionInfo] = []
+        self.calls: List[CallRecord] = []
+        self.includes: List[Tuple[str, str]] = []
+        self._cursor: Optional[Cursor] = None
+        self._info: Optional[FunctionInfo] = None
 
-    def to_dict(self) -> dict:
-        return {
-            "name": self.name,
-            "file": self.file,
-            "line": self.line,
-            "column": self.column
-        }
+    def release(self) -> None:
+        """Drop the last cursor, which would otherwise keep the translation unit alive."""
+        self._cursor = None
 
-    def json(self) -> str:
-        return json.dumps(self.to_dict(), indent=4)
+    def copy(self, in_project: Optional[Callable[[Optional[str]], bool]] = None) -> "UnitRecords":
+        """
+        Copy the records, optionally keeping only definitions and calls into files
+        accepted by `in_project`. FunctionInfos are copied too, since every call tree
+        assigns its own IDs when interning them.
+        """
+        kept = UnitRecords(self.source_file)
+        kept.definitions = [copy.copy(info) for info in self.definitions
+                            if in_project is None or in_project(info.file)]
+        kept.calls = [(copy.copy(caller), copy.copy(callee), file, line, column)
+                      for caller, callee, file, line, column in self.calls
+                      if in_project is None or in_project(callee.file)]
+        kept.includes = [inclusion for inclusion in self.includes
+                         if in_project is None or in_project(inclusion[1])]
+        return kept
+
+    def info(self, cursor: Cursor) -> FunctionInfo:
+        """Return a FunctionInfo for the cursor, reusing it for consecutive calls by one caller."""
+        if cursor is not self._cursor:
+            self._cursor = cursor
+            self._info = FunctionInfo(cursor)
+        return self._info
 
 
 class CallTree:
@@ -43,150 +78,507 @@ class CallTree:
 
     def __init__(self, project_root: str):
         self.tree: Dict[FunctionInfo, Set[FunctionInfo]] = defaultdict(set)
+        self.symbols: SymbolTable = SymbolTable()
+        self.sites: CallSiteStore = CallSiteStore()
+        self.includes: IncludeGraph = IncludeGraph()
         self.project_root: str = project_root
-
-    def _is_in_project(self, file_path: str) -> bool:
+        self._abs_root: str = os.path.abspath(project_root)
+        self._in_project: Dict[str, bool] = {}
+        # Functions exported by loaded library summaries, tracked although outside the project
+        self.library_usrs: Set[str] = set()
+        # Call sites in headers by (caller ID, callee ID, file ID, line, column), with
+        # the most times one translation unit recorded each
+        self._header_sites: Counter = Counter()
+        # Node size factors by function ID (e.g. from metrics) for the HTML and Vis.js exports
+        self.node_sizes: Dict[int, float] = {}
+        # Loaded from a file saved without USRs: functions are keyed by name only
+        self.keyed_by_name: bool = False
+        # Base name of the files the exports write in the project root
+        self.output_name: str = "calltree"
+
+    def _is_in_project(self, file_path: Optional[str]) -> bool:
+        """Check if the file path is within the project directory."""
+        if file_path is None:
+            return False
+        in_project = self._in_project.get(file_path)
+        if in_project is None:
+            in_project = os.path.abspath(file_path).startswith(self._abs_root)
+            self._in_project[file_path] = in_project
+        return in_project
+
+    def in_project(self, file_path: Optional[str]) -> bool:
         """Check if the file path is within the project directory."""
-        return os.path.abspath(file_path).startswith(os.path.abspath(self.project_root))
+        return self._is_in_project(file_path)
+
+    def is_tracked(self, func: Cursor) -> bool:
+        """Check if calls to the function are recorded: it is in the project or in a library summary."""
+        return self._is_in_project(self.file_of(func)) or \
+            (bool(self.library_usrs) and func.get_usr() in self.library_usrs)
+
+    @staticmethod
+    def file_of(cursor: Cursor) -> Optional[str]:
+        """Return the file name of a cursor, or None for built-ins."""
+        file = cursor.location.file
+        return file.name if file else None
+
+    def add(self, caller: Cursor, callee: Cursor, call: Optional[Cursor] = None) -> None:
+        """
+        Add a callee to the caller's set only if the callee is from the project,
+        recording the location of the call expression if given.
+        """
+        if not self.is_tracked(callee):
+            return
+        caller_info = self.symbols.intern(caller)
+        callee_info = self.symbols.intern(callee)
+        self.tree[caller_info].add(callee_info)
+        if call is not None:
+            location = call.location
+            self.sites.add(caller_info.id, callee_info.id,
+                           location.file.name if location.file else caller_info.file,
+                           location.line, location.column)
+
+    def remove_files(self, file_paths: Set[str]) -> Set[FunctionInfo]:
+        """
+        Forget everything extracted from the given files so their translation units
+        can be built again: callers defined there lose their edges and call sites,
+        and functions defined there go back to being declarations until re-parsed.
+        Return the functions located in the files, to `prune` once re-parsed.
+        """
+        removed = {os.path.abspath(path) for path in file_paths}
+        affected = {info for info in self.symbols.functions if os.path.abspath(info.file) in removed}
+        for info in affected:
+            self.tree.pop(info, None)
+            if info.is_definition:
+                info.is_definition = False
+                self.symbols.externals[info.usr] = info
+        self.sites.discard_callers({info.id for info in affected})
+        self.includes.forget(removed)
+        # Rebuilt from the remaining sites, which covers call trees loaded from a file
+        headers = self._header_files()
+        self._header_sites = Counter(site for site in self.sites.rows() if site[2] in headers)
+        return affected
+
+    def _header_files(self) -> Set[int]:
+        """Return the IDs of the site files included by some unit (all files without an include graph)."""
+        return {file_id for file_id, file in enumerate(self.sites.files)
+                if not self.includes or self.includes.dependent_units(file)}
+
+    def prune(self, candidates: Set[FunctionInfo]) -> int:
+        """
+        Drop the candidates that are neither defined nor connected by any edge, e.g.
+        functions deleted from a re-parsed file. Return how many were dropped.
+        """
+        connected = set(self.tree) | {callee for callees in self.tree.values() for callee in callees}
+        stale = {info for info in candidates if not info.is_definition and info not in connected}
+        if not stale:
+            return 0
+        renumber = self.symbols.remove(stale)
+        self.sites.renumber(renumber)
+        self._header_sites = Counter({(renumber[caller_id], renumber[callee_id], *location): count
+                                      for (caller_id, callee_id, *location), count in self._header_sites.items()})
+        self.node_sizes = {renumber[function_id]: size for function_id, size in self.node_sizes.items()
+                           if function_id in renumber}
+        return len(stale)
+
+    def spill(self, run_file: BinaryIO) -> None:
+        """
+        Move all call sites to an on-disk run file and drop the in-memory edges and
+        header site counts. Every edge has at least one recorded site, so `restore`
+        can rebuild them.
+        """
+        self.sites.spill(run_file)
+        self.tree.clear()
+        self._header_sites.clear()
 
-    def add(self, caller: Cursor, callee: Cursor) -> None:
-        """Add a callee to the caller's set only if the callee is from the project."""
-        if self._is_in_project(callee.location.file.name):
-            self.tree[FunctionInfo(caller)].add(FunctionInfo(callee))
+    def restore(self, run_file: BinaryIO) -> None:
+        """
+        Merge the call sites spilled to the run file back into memory, with those not
+        spilled yet, and rebuild the edges from them. A header site recorded in
+        several runs keeps the most times one run has it, as if never spilled.
+        """
+        headers = self._header_files()
+        current, self.sites = self.sites, CallSiteStore()
+        self.sites.files, self.sites._file_ids = current.files, current._file_ids
+        self._header_sites = Counter()
+        for run in [*current.runs(run_file), current]:
+            run_headers: Counter = Counter()
+            for site in run.rows():
+                if site[2] in headers:
+                    run_headers[site] += 1
+                else:
+                    self.sites.add_row(*site)
+            self._header_sites |= run_headers
+        for site, count in self._header_sites.items():
+            for _ in range(count):
+                self.sites.add_row(*site)
+        for caller_id, callee_id in zip(self.sites.caller, self.sites.callee):
+            self.tree[self.symbols.by_id(caller_id)].add(self.symbols.by_id(callee_id))
+
+    def call_sites(self, callee: FunctionInfo) -> List[Tuple[FunctionInfo, str, int, int]]:
+        """Return (caller, file, line, column) for every call site of the callee."""
+        return [(self.symbols.by_id(caller_id), file, line, column)
+                for caller_id, _, file, line, column in self.sites.sites(callee_id=callee.id)]
+
+    def multiplicity(self, caller: FunctionInfo, callee: FunctionInfo) -> int:
+        """Return how many times the caller calls the callee."""
+        return self.sites.multiplicity(caller.id, callee.id)
 
     def functions(self) -> List[FunctionInfo]:
         """Return all known functions in the call tree."""
         return list(self.tree.keys())
 
-    def calls(self, caller: Cursor) -> Set[FunctionInfo]:
+    def roots(self) -> List[FunctionInfo]:
+        """Return the callers that no other function calls."""
+        called = {callee for callees in self.tree.values() for callee in callees}
+        return [caller for caller in self.tree if caller not in called]
+
+    def entry_points(self, names: List[str]) -> List[FunctionInfo]:
+        """Resolve entry point names, defaulting to the functions nobody calls."""
+        if names:
+            return [info for name in names for info in self.find(name)]
+        return self.roots()
+
+    def find(self, name: str) -> List[FunctionInfo]:
+        """Return the functions with the given name."""
+        return self.symbols.lookup(name)
+
+    def calls(self, caller: FunctionInfo) -> Set[FunctionInfo]:
         """Return the set of functions called by the given caller."""
-        return self.tree[caller]
+        return self.tree.get(caller, set())
 
     def build(self, translation_unit: TranslationUnit) -> None:
         """
         Build a call tree for the given translation unit, considering only functions within the project.
         """
-        self._rec_build(translation_unit.cursor, translation_unit.cursor)
+        self.merge(self.extract(translation_unit))
 
-    def _rec_build(self, node: Cursor, caller: Cursor) -> None:
+    def extract(self, translation_unit: TranslationUnit) -> UnitRecords:
         """
-        Recursively build the call tree by visiting all nodes in the AST, 
+        Walk a translation unit into plain records without touching the call tree,
+        so extraction can run apart from merging.
+        """
+        records = UnitRecords(translation_unit.spelling)
+        self._rec_build(translation_unit.cursor, translation_unit.cursor, records)
+        records.release()
+        records.includes = self.inclusions(translation_unit)
+        return records
+
+    def inclusions(self, translation_unit: TranslationUnit) -> List[Tuple[str, str]]:
+        """Return the (includer, included) pairs of the translation unit that include project files."""
+        return [(inclusion.source.name, inclusion.include.name) for inclusion in translation_unit.get_includes()
+                if self._is_in_project(inclusion.include.name)]
+
+    def merge(self, records: UnitRecords) -> None:
+        """Add the definitions, calls and includes extracted from one translation unit."""
+        self.includes.record(records.source_file, records.includes)
+        for info in records.definitions:
+            self.symbols.intern(info)
+
+        unit_sites: Counter = Counter()
+        for caller, callee, file, line, column in records.calls:
+            caller_info = self.symbols.intern(caller)
+            callee_info = self.symbols.intern(callee)
+            self.tree[caller_info].add(callee_info)
+            unit_sites[(caller_info.id, callee_info.id, file, line, column)] += 1
+        self.merge_sites(records.source_file, unit_sites)
+
+    def merge_sites(self, source_file: str, unit_sites: Counter) -> None:
+        """
+        Add the call sites of one translation unit, counted by (caller ID, callee ID,
+        file, line, column). Headers are walked once per including unit, so a header
+        site is only added again where this unit has more of it than an earlier one;
+        the same header line can still call other functions in another unit (macros).
+        """
+        for (caller_id, callee_id, file, line, column), count in unit_sites.items():
+            if file != source_file:
+                key = (caller_id, callee_id, self.sites.file_id(file), line, column)
+                known = self._header_sites[key]
+                if count <= known:
+                    continue
+                self._header_sites[key] = count
+                count -= known
+            for _ in range(count):
+                self.sites.add(caller_id, callee_id, file, line, column)
+
+    def walk(self, node: Cursor, caller: Cursor, records: UnitRecords) -> None:
+        """Extract the definitions and calls under `node` into `records`, `caller` enclosing it."""
+        self._rec_build(node, caller, records)
+
+    def _rec_build(self, node: Cursor, caller: Cursor, records: UnitRecords) -> None:
+        """
+        Recursively extract calls by visiting all nodes in the AST, 
         considering only functions from the project directory.
         """
-        func_kinds: List[CursorKind] = [
-            CursorKind.FUNCTION_DECL,
-            CursorKind.CXX_METHOD,
-            CursorKind.CONSTRUCTOR,
-            CursorKind.DESTRUCTOR
-        ]
-
-        if node.kind in func_kinds:
+        if node.kind in FUNC_KINDS:
             caller = node
+            if node.is_definition() and self._is_in_project(self.file_of(node)):
+                records.definitions.append(records.info(node))
         elif node.kind == CursorKind.CALL_EXPR and node.referenced:
             func = node.referenced
-            if self._is_in_project(func.location.file.name):
-                caller_str = FunctionInfo(caller) if not isinstance(
-                    caller, TranslationUnit) else FunctionInfo(caller.cursor)
-                self.add(caller_str, func)
+            if func.kind in FUNC_KINDS and caller.kind in FUNC_KINDS and self.is_tracked(func):
+                caller_info = records.info(caller)
+                location = node.location
+                records.calls.append((caller_info, FunctionInfo(func),
+                                      location.file.name if location.file else caller_info.file,
+                                      location.line, location.column))
 
         for child in node.get_children():
-            self._rec_build(child, caller)
-
-    def print(self):
-        """Function to print tree structure with ASCII art"""
-        def print_tree(caller, callees, depth=0):
-            print(f'{caller}')
-            for i, callee in enumerate(callees):
-                if i == len(callees) - 1:
-                    print('\t' * (depth + 1) + f'|')
-                    print('\t' * (depth + 1) + f'|______ {callee}')
+            self._rec_build(child, caller, records)
+
+    def _reachable(self, roots: List[FunctionInfo]) -> Set[FunctionInfo]:
+        """Return every function reachable from the roots."""
+        reached = set(roots)
+        pending = list(roots)
+        while pending:
+            for callee in self.tree.get(pending.pop(), ()):
+                if callee not in reached:
+                    reached.add(callee)
+                    pending.append(callee)
+        return reached
+
+    def print(self, roots: Optional[List[FunctionInfo]] = None, max_depth: Optional[int] = None,
+              out: Optional[TextIO] = None) -> None:
+        """
+        Print the call tree with ASCII art, expanding callees recursively from the
+        roots (by default the functions nobody calls, then any caller left over in a
+        cycle). A function already expanded is marked [see above] instead of being
+        expanded again, a call back into the current path [cycle], and callees cut off
+        by `max_depth` [...]. Lines are written through one buffer in large chunks.
+        """
+        out = out or sys.stdout
+        counts = self.sites.multiplicities()
+        expanded: Set[FunctionInfo] = set()
+        lines: List[str] = []
+
+        def line(prefix: str, caller: Optional[FunctionInfo], callee: FunctionInfo, marker: str) -> None:
+            count = counts.get((caller.id, callee.id), 0) if caller is not None else 0
+            lines.append(f'{prefix}{callee}{f" (x{count})" if count > 1 else ""}{marker}')
+            if len(lines) >= PRINT_BUFFER_LINES:
+                out.write('\n'.join(lines) + '\n')
+                lines.clear()
+
+        def ordered(callees: Set[FunctionInfo]) -> List[FunctionInfo]:
+            return sorted(callees, key=lambda info: (info.name, info.file))
+
+        def render(root: FunctionInfo) -> None:
+            line('', None, root, '')
+            expanded.add(root)
+            on_path: Set[FunctionInfo] = {root}
+            path: List[FunctionInfo] = [root]
+            # Per level: callees, index of the next one and the indentation of its line
+            stack = [(ordered(self.tree.get(root, ())), [0], '')]
+            while stack:
+                callees, position, prefix = stack[-1]
+                if position[0] == len(callees):
+                    stack.pop()
+                    on_path.discard(path.pop())
+                    continue
+                callee = callees[position[0]]
+                position[0] += 1
+                connector = prefix + '|______ '
+                grandchildren = self.tree.get(callee)
+                if callee in on_path:
+                    line(connector, path[-1], callee, ' [cycle]')
+                elif not grandchildren:
+                    line(connector, path[-1], callee, '')
+                elif callee in expanded:
+                    line(connector, path[-1], callee, ' [see above]')
+                elif max_depth is not None and len(path) >= max_depth:
+                    line(connector, path[-1], callee, ' [...]')
                 else:
-                    print('\t' * (depth + 1) + f'|')
-                    print('\t' * (depth + 1) + f'|______ {callee}')
-                    print('\t' * (depth + 1) + f'|')
-            print('')
-
-        # Group by caller
-        grouped_callers = defaultdict(list)
-        for caller, callees in self.tree.items():
-            grouped_callers[caller].extend(callees)
-
-        # Print grouped callers
-        for caller, callees in grouped_callers.items():
-            print_tree(caller, callees)
-            print()  # Add a blank line for readability between different callers
+                    line(connector, path[-1], callee, '')
+                    expanded.add(callee)
+                    on_path.add(callee)
+                    path.append(callee)
+                    last = position[0] == len(callees)
+                    stack.append((ordered(grandchildren), [0], prefix + ('        ' if last else '|       ')))
+            lines.append('')
+
+        for root in roots if roots is not None else self.roots():
+            render(root)
+        if roots is None:
+            # Callers only reachable through a cycle have no root, start from the first one left
+            reached = self._reachable(self.roots())
+            for caller in list(self.tree):
+                if caller not in reached:
+                    render(caller)
+                    reached |= self._reachable([caller])
+        out.write('\n'.join(lines) + ('\n' if lines else ''))
+        out.flush()
+
+    def _node_dict(self, info: FunctionInfo) -> dict:
+        """Return the exported form of a function, with its node size when metrics set one."""
+        info_dict = info.to_dict()
+        if self.node_sizes:
+            info_dict["size"] = self.node_sizes.get(info.id, 1)
+        return info_dict
 
     def as_dict(self) -> dict:
-        """Function to save tree structure as JSON with merged duplicate callers"""
-        # Dictionary to group callers by their unique identifier (name, file, line, column)
-        caller_groups = {}
-
-        for caller in self.tree:
-            # Create a unique key for this caller based on its attributes
-            caller_key = (
-                getattr(caller, 'name', 'Unknown'),
-                getattr(caller, 'file', 'Unknown'),
-                getattr(caller, 'line', 0),
-                getattr(caller, 'column', 0)
-            )
-
-            # If this caller already exists, add its callees to the existing entry
-            if caller_key in caller_groups:
-                # Add new callees to the existing list
-                current_callees = caller_groups[caller_key]["callees"]
-                for callee in self.tree[caller]:
-                    callee_dict = {
-                        "name": getattr(callee, 'name', 'Unknown'),
-                        "file": getattr(callee, 'file', 'Unknown'),
-                        "line": getattr(callee, 'line', 0),
-                        "column": getattr(callee, 'column', 0)
-                    }
-                    if callee_dict not in current_callees:  # Avoid duplicates
-                        current_callees.append(callee_dict)
-            else:
-                # Create new entry for this caller
-                callees_list = []
-                for callee in self.tree[caller]:
-                    callee_dict = {
-                        "name": getattr(callee, 'name', 'Unknown'),
-                        "file": getattr(callee, 'file', 'Unknown'),
-                        "line": getattr(callee, 'line', 0),
-                        "column": getattr(callee, 'column', 0)
-                    }
-                    callees_list.append(callee_dict)
-
-                caller_groups[caller_key] = {
-                    "name": caller_key[0],  # Name
-                    "file": caller_key[1],  # File
-                    "line": caller_key[2],  # Line
-                    "column": caller_key[3],  # Column
-                    "callees": callees_list
-                }
-
-        # Convert grouped callers to the final "calltree" list
-        calltree_list = list(caller_groups.values())
-
-        # Create the final structure with "calltree" as the root key
-        return {"calltree": calltree_list}
-
-    def to_json(self):
-        json_filepath = os.path.join(self.project_root, "calltree.json")
-        with open(json_filepath, "w") as json_file:
-            json.dump(self.as_dict(), json_file, indent=4)
+        """
+        Function to save tree structure as JSON, in the compact schema (version 2):
+        function IDs index the function table, edges are [caller, callee] ID pairs
+        and call sites are [edge, file, line, column] rows.
+        """
+        writer = CompactWriter()
+        for info in self.symbols.functions:
+            writer.function(info.name, info.file, info.line, info.column, info.end_line, info.usr,
+                            info.is_definition)
+        edges: Dict[Tuple[int, int], int] = {}
+        for caller, callees in self.tree.items():
+            for callee in callees:
+                edges[(caller.id, callee.id)] = writer.edge(caller.id, callee.id)
+        for caller_id, callee_id, file, line, column in self.sites.sites():
+            edge = edges.get((caller_id, callee_id))
+            if edge is not None:
+                writer.site(edge, file, line, column)
+
+        data = writer.as_dict()
+        if self.node_sizes:
+            data["sizes"] = [self.node_sizes.get(function_id, 1) for function_id in range(len(self.symbols.functions))]
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict, project_root: str) -> "CallTree":
+        """Rebuild a call tree from the structure produced by `as_dict`, or from a version 1 file."""
+        call_tree = cls(project_root)
+        call_tree.keyed_by_name = predates_usrs(data)
+        data = upgrade(data)
+        infos = [call_tree.symbols.intern(info) for info in read_functions(data)]
+        edges = data["edges"]
+        for caller, callee in edges:
+            call_tree.tree[infos[caller]].add(infos[callee])
+        files = data["files"]
+        for edge, file, line, column in data["sites"]:
+            caller, callee = edges[edge]
+            call_tree.sites.add(infos[caller].id, infos[callee].id, files[file], line, column)
+        if "sizes" in data:
+            call_tree.node_sizes = {info.id: size for info, size in zip(infos, data["sizes"])}
+        if "includes" in data:
+            call_tree.includes = IncludeGraph.from_dict(data["includes"])
+        return call_tree
+
+    @classmethod
+    def load(cls, json_filepath: str, project_root: Optional[str] = None) -> "CallTree":
+        """Load a call tree previously saved with `to_json` or `to_npz`."""
+        if json_filepath.endswith(".npz"):
+            from columnar import from_npz
+            return from_npz(json_filepath, project_root or os.path.dirname(json_filepath))
+        with (gzip.open(json_filepath, "rt") if json_filepath.endswith(".gz") else open(json_filepath)) as json_file:
+            data = json.load(json_file)
+        return cls.from_dict(data, project_root or os.path.dirname(json_filepath))
+
+    def output_path(self, suffix: str) -> str:
+        """Return the path of an export, e.g. `output_path(".json")` for calltree.json."""
+        return os.path.join(self.project_root, self.output_name + suffix)
+
+    def to_json(self, compress: bool = False):
+        data = self.as_dict()
+        # Saved along so a later --since run finds the affected units without re-scanning
+        if self.includes:
+            data["includes"] = self.includes.as_dict()
+        if compress:
+            json_filepath = self.output_path(".json.gz")
+            with gzip.open(json_filepath, "wt", compresslevel=9) as json_file:
+                json.dump(data, json_file, separators=(',', ':'))
+        else:
+            json_filepath = self.output_path(".json")
+            with open(json_filepath, "w") as json_file:
+                json.dump(data, json_file, separators=(',', ':'))
         print(f"JSON calltree saved at {json_filepath}")
 
-    def to_html(self):
-        json_data = json.dumps(self.as_dict(), indent=4)
-        html_filepath = os.path.join(self.project_root, "calltree.html")
+    def to_includes(self):
+        """
+        Save the include graph as calltree_includes.json (every project file with the
+        files it includes and the units depending on it) and the module dependency
+        view as calltree_modules.dot.
+        """
+        graph = self.includes
+        direct: Dict[int, Set[int]] = defaultdict(set)
+        for includer, included in graph.edges():
+            direct[includer].add(included)
+        files = [{
+            "file": os.path.relpath(file, self._abs_root),
+            "includes": sorted(os.path.relpath(graph.files[i], self._abs_root) for i in direct[file_id]),
+            "dependents": [os.path.relpath(unit, self._abs_root) for unit in graph.dependent_units(file)]
+        } for file_id, file in enumerate(graph.files)]
+        includes_filepath = self.output_path("_includes.json")
+        with open(includes_filepath, "w") as includes_file:
+            json.dump({"files": files}, includes_file, indent=4)
+        print(f"Include graph saved at {includes_filepath}")
+
+        dot_filepath = self.output_path("_modules.dot")
+        with open(dot_filepath, "w") as dot_file:
+            dot_file.write(graph.to_dot(self.project_root))
+        print(f"Module dependency graph saved at {dot_filepath}")
+
+    def to_npz(self, compress: bool = False):
+        """Save the call tree as a columnar NumPy bundle (requires numpy)."""
+        from columnar import to_npz
+        to_npz(self, self.output_path(".npz"), compress)
+
+    def to_html(self, compress: bool = False):
+        html_filepath = self.output_path(".html")
         with open(html_filepath, "w") as html_file:
-            html_file.write(HTML_TEMPLATE.replace(JSON_REPLACE_HINT, json_data))
+            html_file.write(render_html(self.as_dict(), compress=compress))
         print(f"HTML calltree saved at {html_filepath}")
 
+    def to_sharded_html(self, by: str = "module", compress: bool = False):
+        """
+        Write an index page plus one page per module (or per function with `by="function"`).
+        Each page embeds only the edges touching its shard; double-clicking a node that
+        belongs to another shard opens that shard's page.
+        """
+        def module_of(info: FunctionInfo) -> str:
+            return re.split(r'[\\/]', info.file)[-1].split('.')[0]
+
+        if by == "module":
+            shard_of = module_of
+            page_of = lambda shard: f"module_{shard}.html"
+            link_key = module_of
+        else:
+            shard_of = lambda info: info.id
+            page_of = lambda shard: f"function_{shard}.html"
+            link_key = lambda info: f"{info.file}:{info.name}"
+
+        shards: Dict[object, List[Tuple[FunctionInfo, FunctionInfo]]] = defaultdict(list)
+        for caller, callees in self.tree.items():
+            for callee in callees:
+                shards[shard_of(caller)].append((caller, callee))
+                if shard_of(callee) != shard_of(caller):
+                    shards[shard_of(callee)].append((caller, callee))
+
+        shard_dir = self.output_path("_html")
+        os.makedirs(shard_dir, exist_ok=True)
+        entries = []
+        for shard, edges in shards.items():
+            callers: Dict[FunctionInfo, dict] = {}
+            links: Dict[str, str] = {}
+            for caller, callee in edges:
+                caller_dict = callers.get(caller)
+                if caller_dict is None:
+                    caller_dict = callers[caller] = dict(self._node_dict(caller), callees=[])
+                caller_dict["callees"].append(self._node_dict(callee))
+                for info in (caller, callee):
+                    if shard_of(info) != shard:
+                        links[link_key(info)] = page_of(shard_of(info))
+            with open(os.path.join(shard_dir, page_of(shard)), "w") as html_file:
+                html_file.write(render_html(compact(list(callers.values())), links, compress))
+            title = shard if by == "module" else repr(self.symbols.by_id(shard))
+            entries.append((str(title), page_of(shard), len(edges)))
+
+        page_list = "\n".join(f'        <li><a href="{page}">{html.escape(title)}</a> ({count} calls)</li>'
+                              for title, page, count in sorted(entries))
+        index_filepath = os.path.join(shard_dir, "index.html")
+        with open(index_filepath, "w") as html_file:
+            html_file.write(INDEX_TEMPLATE.replace(PAGE_LIST_REPLACE_HINT, page_list))
+        print(f"HTML calltree index saved at {index_filepath} ({len(entries)} pages)")
+
     def to_visjs(self):
         """Output call tree in a format compatible with Vis.js"""
         nodes = []
         edges = []
         modules = {}
+        function_ids = set()
 
         for caller in self.tree:
             file_path = caller.file  # Assuming caller has a 'file' attribute
@@ -206,16 +598,18 @@ class CallTree:
                 })
 
             caller_id = f"func_{base_name}_{caller.name}"
-            nodes.append({
-                "id": caller_id,
-                "label": caller.name,
-                "group": "function",
-                "shape": "box",
-                "color": {"background": "#e6f3ff", "border": "#4a90e2"},
-                "font": {"size": 12},
-                "size": 30,
-                "parent": modules[base_name]  # Link to module
-            })
+            if caller_id not in function_ids:
+                function_ids.add(caller_id)
+                nodes.append({
+                    "id": caller_id,
+                    "label": caller.name,
+                    "group": "function",
+                    "shape": "box",
+                    "color": {"background": "#e6f3ff", "border": "#4a90e2"},
+                    "font": {"size": round(12 * self.node_sizes.get(caller.id, 1))},
+                    "size": round(30 * self.node_sizes.get(caller.id, 1)),
+                    "parent": modules[base_name]  # Link to module
+                })
 
             # Link module to function
             edges.append({
@@ -243,15 +637,16 @@ class CallTree:
                     })
 
                 callee_id = f"func_{callee_base_name}_{callee.name}"
-                if not any(node["id"] == callee_id for node in nodes):
+                if callee_id not in function_ids:
+                    function_ids.add(callee_id)
                     nodes.append({
                         "id": callee_id,
                         "label": callee.name,
                         "group": "function",
                         "shape": "box",
                         "color": {"background": "#e6f3ff", "border": "#4a90e2"},
-                        "font": {"size": 12},
-                        "size": 30,
+                        "font": {"size": round(12 * self.node_sizes.get(callee.id, 1))},
+                        "size": round(30 * self.node_sizes.get(callee.id, 1)),
                         "parent": modules[callee_base_name]
                     })
 
@@ -0,0 +1,118 @@
+from array import array
+from collections import Counter
+from typing import BinaryIO, List, Dict, Iterator, Optional, Set, Tuple
+
+
+COLUMNS = ("caller", "callee", "file", "line", "column")
+
+
+class CallSiteStore:
+    """
+    Call sites stored column-wise in parallel typed arrays.
+
+    Each call site is a (caller ID, callee ID, file ID, line, column) row, costing
+    20 bytes instead of a Python object per site. Function IDs come from the
+    SymbolTable, file IDs from the store's own file string table.
+    """
+
+    def __init__(self):
+        self.caller: array = array('I')
+        self.callee: array = array('I')
+        self.file: array = array('I')
+        self.line: array = array('I')
+        self.column: array = array('I')
+        self.files: List[str] = []
+        self._file_ids: Dict[str, int] = {}
+        self._counts: Optional[Counter] = None
+
+    def __len__(self) -> int:
+        return len(self.caller)
+
+    def file_id(self, file_path: str) -> int:
+        """Return the ID of a file path, adding it to the string table if new."""
+        file_id = self._file_ids.get(file_path)
+        if file_id is None:
+            file_id = len(self.files)
+            self._file_ids[file_path] = file_id
+            self.files.append(file_path)
+        return file_id
+
+    def add(self, caller_id: int, callee_id: int, file_path: str, line: int, column: int) -> None:
+        """Record one call site."""
+        self.caller.append(caller_id)
+        self.callee.append(callee_id)
+        self.file.append(self.file_id(file_path))
+        self.line.append(line)
+        self.column.append(column)
+        self._counts = None
+
+    def discard_callers(self, caller_ids: Set[int]) -> None:
+        """Remove every call site whose caller is in the given set, compacting the arrays."""
+        keep = [i for i, caller_id in enumerate(self.caller) if caller_id not in caller_ids]
+        for name in COLUMNS:
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, (column[i] for i in keep)))
+        self._counts = None
+
+    def renumber(self, function_ids: Dict[int, int]) -> None:
+        """Map the caller and callee IDs through `function_ids`, after functions were dropped."""
+        self.caller = array('I', (function_ids[caller_id] for caller_id in self.caller))
+        self.callee = array('I', (function_ids[callee_id] for callee_id in self.callee))
+        self._counts = None
+
+    def spill(self, run_file: BinaryIO) -> None:
+        """Append all call sites to an on-disk run file and release them from memory."""
+        array('Q', [len(self.caller)]).tofile(run_file)
+        for name in COLUMNS:
+            getattr(self, name).tofile(run_file)
+            setattr(self, name, array('I'))
+        self._counts = None
+
+    def runs(self, run_file: BinaryIO) -> Iterator["CallSiteStore"]:
+        """Yield each run spilled to the file as a store sharing this store's file table."""
+        run_file.seek(0)
+        while True:
+            header = array('Q')
+            try:
+                header.fromfile(run_file, 1)
+            except EOFError:
+                break
+            run = CallSiteStore()
+            run.files, run._file_ids = self.files, self._file_ids
+            for name in COLUMNS:
+                getattr(run, name).fromfile(run_file, header[0])
+            yield run
+
+    def rows(self) -> Iterator[Tuple[int, int, int, int, int]]:
+        """Yield every call site as a (caller ID, callee ID, file ID, line, column) row."""
+        return zip(self.caller, self.callee, self.file, self.line, self.column)
+
+    def add_row(self, caller_id: int, callee_id: int, file_id: int, line: int, column: int) -> None:
+        """Record one call site whose file is already in the string table."""
+        self.add(caller_id, callee_id, self.files[file_id], line, column)
+
+    def multiplicities(self) -> Counter:
+        """Return the number of call sites per (caller ID, callee ID) edge."""
+        if self._counts is None:
+            self._counts = Counter(zip(self.caller, self.callee))
+        return self._counts
+
+    def multiplicity(self, caller_id: int, callee_id: int) -> int:
+        """Return how many times the caller calls the callee."""
+        return self.multiplicities().get((caller_id, callee_id), 0)
+
+    def sites(self, caller_id: Optional[int] = None,
+              callee_id: Optional[int] = None) -> Iterator[Tuple[int, int, str, int, int]]:
+        """Yield (caller ID, callee ID, file, line, column) for the matching call sites."""
+        for i in range(len(self.caller)):
+            if caller_id is not None and self.caller[i] != caller_id:
+                continue
+            if callee_id is not None and self.callee[i] != callee_id:
+                continue
+            yield (self.caller[i], self.callee[i], self.files[self.file[i]],
+                   self.line[i], self.column[i])
+
+    def nbytes(self) -> int:
+        """Return the memory used by the site arrays, excluding the file table."""
+        return sum(col.itemsize * len(col)
+                   for col in (self.caller, self.callee, self.file, self.line, self.column))
@@ -0,0 +1,88 @@
+from typing import Dict, List, Tuple
+from call_tree import CallTree
+from symbols import FunctionInfo
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for the .npz export
+    np = None
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("numpy is required for .npz export, install it with 'pip install numpy'")
+
+
+def _intern(values: List[str]) -> Tuple[List[str], List[int]]:
+    """Return a string table and the index of every value in it."""
+    table: Dict[str, int] = {}
+    indexes = [table.setdefault(value, len(table)) for value in values]
+    return list(table), indexes
+
+
+def to_npz(call_tree: CallTree, npz_filepath: str, compress: bool = False) -> None:
+    """
+    Save the call tree as a columnar NumPy bundle.
+
+    Functions are rows indexed by their symbol ID, with name and file stored as
+    indexes into string tables. Edges and call sites are parallel integer arrays.
+    """
+    _require_numpy()
+    functions = call_tree.symbols.functions
+    names, name_idx = _intern([info.name for info in functions])
+    files, file_idx = _intern([info.file for info in functions] + call_tree.sites.files)
+    site_file_map = np.asarray(file_idx[len(functions):], dtype=np.int32)
+    edges = [(caller.id, callee.id) for caller, callees in call_tree.tree.items() for callee in callees]
+
+    save = np.savez_compressed if compress else np.savez
+    save(npz_filepath,
+         version=np.int32(1),
+         names=np.asarray(names, dtype=str),
+         files=np.asarray(files, dtype=str),
+         function_name=np.asarray(name_idx, dtype=np.int32),
+         function_file=np.asarray(file_idx[:len(functions)], dtype=np.int32),
+         function_line=np.asarray([info.line for info in functions], dtype=np.int32),
+         function_column=np.asarray([info.column for info in functions], dtype=np.int32),
+         function_end_line=np.asarray([info.end_line for info in functions], dtype=np.int32),
+         function_defined=np.asarray([info.is_definition for info in functions], dtype=bool),
+         function_usr=np.asarray([info.usr for info in functions], dtype=str),
+         edge_caller=np.asarray([caller for caller, _ in edges], dtype=np.int32),
+         edge_callee=np.asarray([callee for _, callee in edges], dtype=np.int32),
+         site_caller=np.frombuffer(call_tree.sites.caller, dtype=np.uint32).astype(np.int32),
+         site_callee=np.frombuffer(call_tree.sites.callee, dtype=np.uint32).astype(np.int32),
+         site_file=site_file_map[np.frombuffer(call_tree.sites.file, dtype=np.uint32)]
+         if len(call_tree.sites) else np.zeros(0, dtype=np.int32),
+         site_line=np.frombuffer(call_tree.sites.line, dtype=np.uint32).astype(np.int32),
+         site_column=np.frombuffer(call_tree.sites.column, dtype=np.uint32).astype(np.int32))
+    print(f"NPZ calltree saved at {npz_filepath}")
+
+
+def load_arrays(npz_filepath: str) -> Dict[str, "np.ndarray"]:
+    """Read the bundle as plain arrays for vectorized analysis."""
+    _require_numpy()
+    with np.load(npz_filepath, allow_pickle=False) as bundle:
+        return {name: bundle[name] for name in bundle.files}
+
+
+def from_npz(npz_filepath: str, project_root: str) -> CallTree:
+    """Rebuild a CallTree from a bundle written by `to_npz`."""
+    arrays = load_arrays(npz_filepath)
+    names = arrays["names"].tolist()
+    files = arrays["files"].tolist()
+    call_tree = CallTree(project_root)
+    end_lines = arrays.get("function_end_line", arrays["function_line"])
+    for name, file, line, column, end_line, defined, usr in zip(
+            arrays["function_name"].tolist(), arrays["function_file"].tolist(),
+            arrays["function_line"].tolist(), arrays["function_column"].tolist(), end_lines.tolist(),
+            arrays["function_defined"].tolist(), arrays["function_usr"].tolist()):
+        call_tree.symbols.intern(FunctionInfo.from_dict({
+            "name": names[name], "file": files[file], "line": line, "column": column,
+            "end_line": end_line, "usr": usr, "defined": defined}))
+    by_id = call_tree.symbols.by_id
+    for caller, callee in zip(arrays["edge_caller"].tolist(), arrays["edge_callee"].tolist()):
+        call_tree.tree[by_id(caller)].add(by_id(callee))
+    for caller, callee, file, line, column in zip(
+            arrays["site_caller"].tolist(), arrays["site_callee"].tolist(), arrays["site_file"].tolist(),
+            arrays["site_line"].tolist(), arrays["site_column"].tolist()):
+        call_tree.sites.add(caller, callee, files[file], line, column)
+    return call_tree
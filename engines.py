@@ -0,0 +1,74 @@
+import os
+import time
+from typing import Callable, Dict, List, Set, Tuple
+from call_tree import CallTree
+from project import ProjectAnalyzer
+import fast_engine
+import index_engine
+
+
+def build_libclang(analyzer: ProjectAnalyzer, call_tree: CallTree) -> None:
+    """Parse every file with libclang and walk its cursors (the default engine)."""
+    for source_file in analyzer.get_source_files():
+        tu = analyzer.get_translation_unit(source_file)
+        if tu:
+            call_tree.build(tu)
+
+
+ENGINES: Dict[str, Callable[[ProjectAnalyzer, CallTree], None]] = {
+    "libclang": build_libclang,
+    "index": index_engine.build,
+    "fast": fast_engine.build,
+}
+
+
+def build(engine: str, analyzer: ProjectAnalyzer, call_tree: CallTree) -> None:
+    """Build the call tree with the named extraction engine."""
+    ENGINES[engine](analyzer, call_tree)
+
+
+def _functions(call_tree: CallTree) -> Set[Tuple[str, str]]:
+    return {(os.path.basename(info.file), info.name) for info in call_tree.symbols.definitions()}
+
+
+def _edges(call_tree: CallTree) -> Set[Tuple[str, str]]:
+    return {(caller.name, callee.name) for caller, callees in call_tree.tree.items() for callee in callees}
+
+
+def _score(reference: set, candidate: set) -> dict:
+    found = len(reference & candidate)
+    return {
+        "precision": found / len(candidate) if candidate else 1.0,
+        "recall": found / len(reference) if reference else 1.0,
+        "missing": sorted(reference - candidate),
+        "extra": sorted(candidate - reference)
+    }
+
+
+def compare(project_directory: str, engines: List[str], reference: str = "libclang") -> Dict[str, dict]:
+    """
+    Build the project with each engine, timing it and scoring its definitions and
+    edges (by file base name and function name) against the reference engine.
+    """
+    trees: Dict[str, CallTree] = {}
+    results: Dict[str, dict] = {}
+    for engine in [reference] + [engine for engine in engines if engine != reference]:
+        analyzer = ProjectAnalyzer(project_directory)
+        call_tree = CallTree(project_directory)
+        start = time.perf_counter()
+        build(engine, analyzer, call_tree)
+        trees[engine] = call_tree
+        results[engine] = {"seconds": time.perf_counter() - start}
+
+    for engine, call_tree in trees.items():
+        results[engine]["functions"] = _score(_functions(trees[reference]), _functions(call_tree))
+        results[engine]["edges"] = _score(_edges(trees[reference]), _edges(call_tree))
+        functions, edges = results[engine]["functions"], results[engine]["edges"]
+        print(f"{engine:>10}: {results[engine]['seconds']:8.3f} s, "
+              f"functions P={functions['precision']:.3f} R={functions['recall']:.3f}, "
+              f"edges P={edges['precision']:.3f} R={edges['recall']:.3f}")
+        for caller, callee in edges["missing"][:10]:
+            print(f"{'':>12}missing {caller} -> {callee}")
+        for caller, callee in edges["extra"][:10]:
+            print(f"{'':>12}extra   {caller} -> {callee}")
+    return results
@@ -0,0 +1,139 @@
+import os
+import re
+from bisect import bisect_right
+from typing import List, Dict, Optional, Tuple
+from call_tree import CallTree, UnitRecords
+from project import ProjectAnalyzer
+from symbols import FunctionInfo
+
+
+TOKEN = re.compile(r'''
+    (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+  | (?P<directive>^[ \t]*\#(?:\\\n|[^\n])*)
+  | (?P<number>\.?\d[\w.]*)
+  | (?P<ident>[A-Za-z_]\w*)
+  | (?P<punct>->|[(){};.])
+''', re.S | re.M | re.X)
+
+NOT_CALLS = frozenset((
+    'if', 'while', 'for', 'switch', 'return', 'sizeof', 'do', 'else', 'case', 'goto',
+    'typeof', '__typeof__', 'alignof', '_Alignof', '__attribute__', '__asm__', 'asm',
+    'defined', '_Static_assert', 'static_assert', '_Generic'))
+
+Token = Tuple[str, str, int]  # kind, text, offset
+
+
+class SourceFile:
+    """A tokenized C source with offset -> line/column lookup."""
+
+    def __init__(self, path: str):
+        self.path: str = path
+        with open(path, encoding='utf-8', errors='replace') as source:
+            text = source.read()
+        self.line_starts: List[int] = [0] + [m.end() for m in re.finditer('\n', text)]
+        self.tokens: List[Token] = [(m.lastgroup, m.group(), m.start()) for m in TOKEN.finditer(text)
+                                    if m.lastgroup in ('ident', 'punct')]
+
+    def position(self, offset: int) -> Tuple[int, int]:
+        line = bisect_right(self.line_starts, offset)
+        return line, offset - self.line_starts[line - 1] + 1
+
+    def matching_parens(self) -> Dict[int, int]:
+        """Map the index of every '(' token to the index of its ')'."""
+        matches: Dict[int, int] = {}
+        opened: List[int] = []
+        for i, (_, text, _) in enumerate(self.tokens):
+            if text == '(':
+                opened.append(i)
+            elif text == ')' and opened:
+                matches[opened.pop()] = i
+        return matches
+
+
+class FileScan:
+    """Definitions and raw (caller, callee name, line, column) calls found in one file."""
+
+    def __init__(self, path: str):
+        self.path: str = path
+        self.definitions: List[FunctionInfo] = []
+        self.calls: List[Tuple[FunctionInfo, str, int, int]] = []
+
+
+def scan_file(path: str) -> FileScan:
+    """
+    Heuristically find function definitions and call expressions.
+
+    At file scope, an identifier followed by a parenthesized list and then '{' starts
+    a definition (so `FUNC(void, CODE) Name(void) {` finds `Name`). Inside a body, an
+    identifier directly followed by '(' is a call unless it is a keyword or a member.
+    Preprocessor lines, comments and literals are skipped.
+    """
+    source = SourceFile(path)
+    tokens = source.tokens
+    parens = source.matching_parens()
+    scan = FileScan(path)
+    depth = 0
+    is_static = False
+    current: Optional[FunctionInfo] = None
+    i = 0
+    while i < len(tokens):
+        kind, text, offset = tokens[i]
+        if text == '{':
+            depth += 1
+        elif text == '}':
+            depth = max(depth - 1, 0)
+            if depth == 0:
+                if current is not None:
+                    current.end_line = source.position(offset)[0]
+                    current = None
+                is_static = False
+        elif depth == 0:
+            if text == ';':
+                is_static = False
+            elif text == 'static':
+                is_static = True
+            elif kind == 'ident' and i + 1 < len(tokens) and tokens[i + 1][1] == '(':
+                close = parens.get(i + 1)
+                if close is not None and close + 1 < len(tokens) and tokens[close + 1][1] == '{':
+                    line, column = source.position(offset)
+                    prefix = os.path.basename(path) if is_static else ''
+                    current = FunctionInfo.from_dict({
+                        "name": text, "file": path, "line": line, "column": column,
+                        "usr": f"c:{prefix}@F@{text}", "defined": True})
+                    scan.definitions.append(current)
+                    i = close + 1
+                    continue
+        elif current is not None and kind == 'ident' and text not in NOT_CALLS \
+                and i + 1 < len(tokens) and tokens[i + 1][1] == '(' \
+                and tokens[i - 1][1] not in ('.', '->'):
+            line, column = source.position(offset)
+            scan.calls.append((current, text, line, column))
+        i += 1
+    return scan
+
+
+def build(analyzer: ProjectAnalyzer, call_tree: CallTree) -> None:
+    """
+    Build the call tree without libclang.
+
+    All files are scanned first so that calls can be resolved against the project's
+    definitions: file-static functions win within their file, and calls to names
+    with no definition in the project (library functions, macros) are dropped.
+    """
+    scans = [scan_file(path) for path in analyzer.get_source_files()]
+    public: Dict[str, FunctionInfo] = {}
+    for scan in scans:
+        for info in scan.definitions:
+            if info.usr == f"c:@F@{info.name}":
+                public.setdefault(info.name, info)
+
+    for scan in scans:
+        static = {info.name: info for info in scan.definitions if info.usr != f"c:@F@{info.name}"}
+        records = UnitRecords(scan.path)
+        records.definitions = scan.definitions
+        for caller, name, line, column in scan.calls:
+            callee = static.get(name) or public.get(name)
+            if callee is not None:
+                records.calls.append((caller, callee, scan.path, line, column))
+        call_tree.merge(records)
@@ -0,0 +1,97 @@
+import os
+import json
+from typing import Dict, Set, Tuple
+from call_tree import CallTree
+from symbols import FunctionInfo
+from schema import compact
+from template import render_html
+
+
+Edge = Tuple[str, str]
+
+
+def _edges(call_tree: CallTree) -> Dict[Edge, Tuple[FunctionInfo, FunctionInfo]]:
+    """Index all call edges of a tree by their (caller USR, callee USR) pair."""
+    return {(caller.usr, callee.usr): (caller, callee)
+            for caller, callees in call_tree.tree.items()
+            for callee in callees}
+
+
+def diff(old: CallTree, new: CallTree) -> dict:
+    """
+    Compare two call trees by function USR and by (caller, callee) edge.
+
+    Functions and edges are compared as hashed sets, so the cost is linear in the
+    size of both graphs.
+    """
+    old_edges = _edges(old)
+    new_edges = _edges(new)
+    old_functions: Set[str] = set(old.symbols.symbols)
+    new_functions: Set[str] = set(new.symbols.symbols)
+
+    return {
+        "added_functions": [new.symbols.get(usr).to_dict() for usr in new_functions - old_functions],
+        "removed_functions": [old.symbols.get(usr).to_dict() for usr in old_functions - new_functions],
+        "added_edges": [{"caller": new_edges[edge][0].to_dict(), "callee": new_edges[edge][1].to_dict()}
+                        for edge in new_edges.keys() - old_edges.keys()],
+        "removed_edges": [{"caller": old_edges[edge][0].to_dict(), "callee": old_edges[edge][1].to_dict()}
+                          for edge in old_edges.keys() - new_edges.keys()]
+    }
+
+
+def neighborhood(delta: dict, new: CallTree) -> dict:
+    """
+    Build a calltree dictionary with the changed edges and the unchanged edges of
+    the new tree that touch a changed function, each edge carrying its status.
+    """
+    callers: Dict[str, dict] = {}
+    present: Set[Edge] = set()
+
+    def add_edge(caller: dict, callee: dict, status: str) -> None:
+        present.add((caller["usr"], callee["usr"]))
+        entry = callers.get(caller["usr"])
+        if entry is None:
+            entry = callers[caller["usr"]] = dict(caller, callees=[])
+        entry["callees"].append(dict(callee, status=status))
+
+    changed: Set[str] = set()
+    for status in ("added", "removed"):
+        for edge in delta[f"{status}_edges"]:
+            add_edge(edge["caller"], edge["callee"], status)
+            changed.add(edge["caller"]["usr"])
+            changed.add(edge["callee"]["usr"])
+
+    for caller, callees in new.tree.items():
+        for callee in callees:
+            if (caller.usr in changed or callee.usr in changed) and \
+                    (caller.usr, callee.usr) not in present:
+                add_edge(caller.to_dict(), callee.to_dict(), "unchanged")
+
+    return compact(list(callers.values()))
+
+
+def write_diff(old_json: str, new_json: str, output_dir: str) -> dict:
+    """
+    Diff two saved calltree.json files and write the delta as JSON and HTML.
+    Raises ValueError if either file was saved without USRs.
+    """
+    old = CallTree.load(old_json)
+    new = CallTree.load(new_json)
+    for json_filepath, call_tree in ((old_json, old), (new_json, new)):
+        if call_tree.keyed_by_name:
+            raise ValueError(f"{json_filepath} was saved without USRs, rebuild required to diff it")
+    delta = diff(old, new)
+
+    json_filepath = os.path.join(output_dir, "calltree_diff.json")
+    with open(json_filepath, "w") as json_file:
+        json.dump(delta, json_file, indent=4)
+    print(f"JSON diff saved at {json_filepath}")
+
+    html_filepath = os.path.join(output_dir, "calltree_diff.html")
+    with open(html_filepath, "w") as html_file:
+        html_file.write(render_html(neighborhood(delta, new)))
+    print(f"HTML diff saved at {html_filepath}")
+
+    print(f"+{len(delta['added_edges'])} -{len(delta['removed_edges'])} edges, "
+          f"+{len(delta['added_functions'])} -{len(delta['removed_functions'])} functions")
+    return delta
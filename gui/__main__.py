@@ -1,20 +1,15 @@
-from PyQt5.QtWidgets import QApplication, QWidget
+import argparse
+import signal
 
-# Only needed for access to command line arguments
-import sys
+from .viewer import main
 
-# You need one (and only one) QApplication instance per application.
-# Pass in sys.argv to allow command line arguments for your app.
-# If you know you won't use command line arguments QApplication([]) works too.
-app = QApplication(sys.argv)
 
-# Create a Qt widget, which will be our window.
-window = QWidget()
-window.show()  # IMPORTANT!!!!! Windows are hidden by default.
+parser = argparse.ArgumentParser(
+    description="Browse a stored call graph (run from the repository root: python -m gui calltree.json).")
+parser.add_argument("json_file", help="calltree.json written with -ojson")
+args = parser.parse_args()
 
-# Start the event loop.
-app.exec()
+# handle SIGINT to make the app terminate on CTRL+C
+signal.signal(signal.SIGINT, signal.SIG_DFL)
 
-
-# Your application won't reach here until you exit and the event
-# loop has stopped.
+main(args.json_file)
@@ -0,0 +1,205 @@
+from collections import defaultdict, deque
+from typing import List, Set, Dict, Optional, Tuple
+
+from Qt import QtCore, QtWidgets # type: ignore
+
+from NodeGraphQt import NodeGraph, BaseNode
+
+from call_tree import CallTree
+
+
+GRID_CELL = 800          # Size of one spatial index cell in scene units
+LAYER_SPACING = 320      # Horizontal distance between call depths
+ROW_SPACING = 90         # Vertical distance between functions of one depth
+MAX_NODES = 1500         # Most nodes kept in the scene at once
+POLL_INTERVAL_MS = 150   # How often the viewport is checked for changes
+
+
+class FunctionNode(BaseNode):
+    """A function of the call tree, with its callers on the left and callees on the right."""
+
+    __identifier__ = 'calltree'
+    NODE_NAME = 'Function'
+
+    def __init__(self):
+        super(FunctionNode, self).__init__()
+        self.add_input('callers', multi_input=True)
+        self.add_output('callees', multi_output=True)
+
+
+class GraphModel:
+    """
+    Plain adjacency lists, layout positions and a grid index over the call graph,
+    built off the GUI thread and never touched by Qt.
+    """
+
+    def __init__(self, call_tree: CallTree):
+        functions = call_tree.symbols.functions
+        self.labels: List[str] = [info.name for info in functions]
+        self.tooltips: List[str] = [repr(info) for info in functions]
+        self.callees: List[List[int]] = [[] for _ in functions]
+        self.callers: List[List[int]] = [[] for _ in functions]
+        for caller, callees in call_tree.tree.items():
+            for callee in callees:
+                self.callees[caller.id].append(callee.id)
+                self.callers[callee.id].append(caller.id)
+        self.positions: List[Tuple[float, float]] = self._layout()
+        self.grid: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for function_id, (x, y) in enumerate(self.positions):
+            self.grid[(int(x // GRID_CELL), int(y // GRID_CELL))].append(function_id)
+
+    def _layout(self) -> List[Tuple[float, float]]:
+        """Place functions in columns by their BFS depth from the root functions."""
+        count = len(self.labels)
+        depth = [-1] * count
+        queue = deque(i for i in range(count) if not self.callers[i])
+        for i in queue:
+            depth[i] = 0
+        unplaced = 0
+        while True:
+            while queue:
+                caller = queue.popleft()
+                for callee in self.callees[caller]:
+                    if depth[callee] < 0:
+                        depth[callee] = depth[caller] + 1
+                        queue.append(callee)
+            # Functions only reachable through cycles start a new root
+            while unplaced < count and depth[unplaced] >= 0:
+                unplaced += 1
+            if unplaced == count:
+                break
+            depth[unplaced] = 0
+            queue.append(unplaced)
+
+        rows: Dict[int, int] = defaultdict(int)
+        positions = []
+        for i in range(count):
+            positions.append((depth[i] * LAYER_SPACING, rows[depth[i]] * ROW_SPACING))
+            rows[depth[i]] += 1
+        return positions
+
+    def visible(self, rect: QtCore.QRectF) -> List[int]:
+        """Return the functions positioned inside the scene rectangle."""
+        found = []
+        for cx in range(int(rect.left() // GRID_CELL), int(rect.right() // GRID_CELL) + 1):
+            for cy in range(int(rect.top() // GRID_CELL), int(rect.bottom() // GRID_CELL) + 1):
+                for function_id in self.grid.get((cx, cy), ()):
+                    x, y = self.positions[function_id]
+                    if rect.contains(x, y):
+                        found.append(function_id)
+        return found
+
+
+class GraphLoader(QtCore.QThread):
+    """Load a stored call graph and lay it out on a background thread."""
+
+    loaded = QtCore.Signal(object)
+    failed = QtCore.Signal(str)
+
+    def __init__(self, json_filepath: str, parent=None):
+        super(GraphLoader, self).__init__(parent)
+        self.json_filepath = json_filepath
+
+    def run(self):
+        try:
+            self.loaded.emit(GraphModel(CallTree.load(self.json_filepath)))
+        except Exception as error:
+            self.failed.emit(str(error))
+
+
+class CallGraphViewer(QtWidgets.QMainWindow):
+    """
+    Desktop viewer that only creates nodes for the functions inside the viewport
+    and for neighbourhoods expanded by double-clicking a node.
+    """
+
+    def __init__(self, json_filepath: str):
+        super(CallGraphViewer, self).__init__()
+        self.setWindowTitle(f"Call Tree - {json_filepath}")
+        self.graph = NodeGraph()
+        self.graph.register_node(FunctionNode)
+        self.graph.node_double_clicked.connect(self._expand)
+        self.setCentralWidget(self.graph.widget)
+        self.resize(1200, 800)
+
+        self.model: Optional[GraphModel] = None
+        self.nodes: Dict[int, FunctionNode] = {}
+        self.expanded: Set[int] = set()
+        self._last_rect = QtCore.QRectF()
+
+        self.statusBar().showMessage(f"Loading {json_filepath}...")
+        self.loader = GraphLoader(json_filepath, self)
+        self.loader.loaded.connect(self._on_loaded)
+        self.loader.failed.connect(lambda error: self.statusBar().showMessage(f"[ERROR] {error}"))
+        self.loader.start()
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self._sync_viewport)
+
+    def _on_loaded(self, model: GraphModel):
+        self.model = model
+        self.statusBar().showMessage(f"{len(model.labels)} functions")
+        self.timer.start(POLL_INTERVAL_MS)
+
+    def _visible_rect(self) -> QtCore.QRectF:
+        viewer = self.graph.viewer()
+        return viewer.mapToScene(viewer.viewport().rect()).boundingRect()
+
+    def _sync_viewport(self):
+        """Create nodes entering the viewport and delete those that left it."""
+        rect = self._visible_rect()
+        if rect == self._last_rect:
+            return
+        self._last_rect = rect
+
+        wanted = self.model.visible(rect)[:MAX_NODES]
+        keep = set(wanted)
+        for function_id in self.expanded:
+            keep.add(function_id)
+            keep.update(self.model.callees[function_id])
+            keep.update(self.model.callers[function_id])
+        for function_id in [i for i in self.nodes if i not in keep]:
+            self.graph.delete_node(self.nodes.pop(function_id), push_undo=False)
+        self._materialize(wanted)
+
+        shown = len(self.nodes)
+        total = len(self.model.labels)
+        self.statusBar().showMessage(f"{shown} of {total} functions shown")
+
+    def _materialize(self, function_ids: List[int]):
+        """Create the missing nodes and connect them to their neighbours already in the scene."""
+        created = []
+        for function_id in function_ids:
+            if function_id in self.nodes:
+                continue
+            node = self.graph.create_node('calltree.FunctionNode', name=self.model.labels[function_id],
+                                          selected=False, pos=list(self.model.positions[function_id]),
+                                          push_undo=False)
+            node.view.setToolTip(self.model.tooltips[function_id])
+            node.function_id = function_id
+            self.nodes[function_id] = node
+            created.append(function_id)
+
+        for function_id in created:
+            node = self.nodes[function_id]
+            for callee in self.model.callees[function_id]:
+                if callee in self.nodes:
+                    node.output(0).connect_to(self.nodes[callee].input(0), push_undo=False, emit_signal=False)
+            for caller in self.model.callers[function_id]:
+                if caller in self.nodes and caller not in created:
+                    self.nodes[caller].output(0).connect_to(node.input(0), push_undo=False, emit_signal=False)
+
+    def _expand(self, node):
+        """Show the callers and callees of a double-clicked node, wherever they are placed."""
+        function_id = getattr(node, 'function_id', None)
+        if function_id is None:
+            return
+        self.expanded.add(function_id)
+        self._materialize(self.model.callers[function_id] + self.model.callees[function_id])
+
+
+def main(json_filepath: str):
+    app = QtWidgets.QApplication([])
+    window = CallGraphViewer(json_filepath)
+    window.show()
+    app.exec_()
@@ -0,0 +1,136 @@
+import os
+import re
+import json
+from bisect import bisect_right
+from collections import defaultdict, deque
+from typing import List, Dict, Iterable, Tuple
+from call_tree import CallTree
+from symbols import FunctionInfo
+
+
+LineRange = Tuple[str, int, int]
+
+HUNK_HEADER = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@')
+
+
+def parse_ranges(specs: Iterable[str]) -> List[LineRange]:
+    """Parse `file:start-end` (or `file:line`) specifications."""
+    ranges: List[LineRange] = []
+    for spec in specs:
+        file, _, lines = spec.rpartition(':')
+        start, _, end = lines.partition('-')
+        ranges.append((file, int(start), int(end or start)))
+    return ranges
+
+
+def parse_diff(diff_text: str) -> List[LineRange]:
+    """Extract the changed line ranges of the new files from a unified diff (ideally -U0)."""
+    ranges: List[LineRange] = []
+    file = None
+    for line in diff_text.splitlines():
+        if line.startswith('+++ '):
+            path = line[4:].split('\t')[0]
+            file = None if path == '/dev/null' else re.sub(r'^b/', '', path)
+        elif file is not None:
+            hunk = HUNK_HEADER.match(line)
+            if hunk:
+                start, count = int(hunk[1]), int(hunk[2] if hunk[2] is not None else 1)
+                # Pure deletions touch the lines around position `start`
+                ranges.append((file, start, start + max(count, 1) - 1))
+    return ranges
+
+
+class ImpactAnalysis:
+    """
+    Reverse reachability from changed functions to entry points.
+
+    Every entry point gets one bit. The bits are pushed forward along the call edges
+    until nothing changes, so afterwards each function holds the bitset of entry
+    points that can reach it, and the impact of any batch of changed functions is
+    the OR of their bitsets.
+    """
+
+    def __init__(self, call_tree: CallTree, entries: List[FunctionInfo]):
+        self.call_tree = call_tree
+        self.entries: List[FunctionInfo] = entries
+        self.reached_by: Dict[FunctionInfo, int] = defaultdict(int)
+        self._index_functions()
+        self._propagate()
+
+    def _index_functions(self) -> None:
+        """Sort the defined functions of every file by start line for range lookups."""
+        functions: Dict[str, List[FunctionInfo]] = defaultdict(list)
+        for info in self.call_tree.symbols.definitions():
+            functions[os.path.normcase(os.path.abspath(info.file))].append(info)
+        self.functions: Dict[str, List[FunctionInfo]] = {}
+        self.starts: Dict[str, List[int]] = {}
+        for file, infos in functions.items():
+            infos.sort(key=lambda info: info.line)
+            self.functions[file] = infos
+            self.starts[file] = [info.line for info in infos]
+
+    def _propagate(self) -> None:
+        tree = self.call_tree.tree
+        pending = deque()
+        for bit, entry in enumerate(self.entries):
+            self.reached_by[entry] |= 1 << bit
+            pending.append(entry)
+        while pending:
+            caller = pending.popleft()
+            mask = self.reached_by[caller]
+            for callee in tree.get(caller, ()):
+                if self.reached_by[callee] | mask != self.reached_by[callee]:
+                    self.reached_by[callee] |= mask
+                    pending.append(callee)
+
+    def _resolve_file(self, file: str) -> str:
+        """Find the indexed file a (possibly repository-relative) path refers to."""
+        for candidate in (file, os.path.join(self.call_tree.project_root, file)):
+            key = os.path.normcase(os.path.abspath(candidate))
+            if key in self.functions:
+                return key
+        suffix = os.path.normcase(os.sep + os.path.normpath(file))
+        return next((key for key in self.functions if key.endswith(suffix)), "")
+
+    def enclosing(self, ranges: Iterable[LineRange]) -> List[FunctionInfo]:
+        """Return the functions whose body overlaps any of the line ranges."""
+        changed: Dict[FunctionInfo, None] = {}
+        for file, start, end in ranges:
+            key = self._resolve_file(file)
+            infos, starts = self.functions.get(key, []), self.starts.get(key, [])
+            # Function bodies do not overlap, so walk back from the last one starting before `end`
+            i = bisect_right(starts, end) - 1
+            while i >= 0 and infos[i].end_line >= start:
+                changed[infos[i]] = None
+                i -= 1
+        return list(changed)
+
+    def affected(self, changed: Iterable[FunctionInfo]) -> List[FunctionInfo]:
+        """Return the entry points that can reach any of the changed functions."""
+        mask = 0
+        for info in changed:
+            mask |= self.reached_by.get(info, 0)
+        return [entry for bit, entry in enumerate(self.entries) if mask >> bit & 1]
+
+
+def write_impact_report(call_tree: CallTree, ranges: List[LineRange], entries: List[FunctionInfo]) -> dict:
+    """Map changed line ranges to functions and entry points and save calltree_impact.json."""
+    analysis = ImpactAnalysis(call_tree, entries)
+    changed = analysis.enclosing(ranges)
+    report = {
+        "changed_functions": [
+            dict(info.to_dict(), entry_points=[entry.name for entry in analysis.affected([info])])
+            for info in changed],
+        "affected_entry_points": [entry.to_dict() for entry in analysis.affected(changed)]
+    }
+
+    for function in report["changed_functions"]:
+        print(f"{function['name']} ({function['file']}:{function['line']}) <- {', '.join(function['entry_points']) or '-'}")
+    print(f"{len(changed)} changed functions affect "
+          f"{len(report['affected_entry_points'])} of {len(entries)} entry points")
+
+    json_filepath = os.path.join(call_tree.project_root, "calltree_impact.json")
+    with open(json_filepath, "w") as json_file:
+        json.dump(report, json_file, indent=4)
+    print(f"Impact report saved at {json_filepath}")
+    return report
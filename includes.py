@@ -0,0 +1,112 @@
+import os
+from array import array
+from collections import Counter, defaultdict
+from typing import Iterable, List, Dict, Set, Tuple
+
+
+def _key(path: str) -> str:
+    return os.path.normpath(os.path.abspath(path))
+
+
+class IncludeGraph:
+    """
+    The `#include` edges seen while parsing, per translation unit.
+
+    Files are interned to integer IDs; each unit keeps its (includer, included)
+    pairs in one flat array, and a reverse index maps every header to the units
+    that include it directly or transitively, so the units affected by a change are
+    found without scanning anything.
+    """
+
+    def __init__(self):
+        self.files: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self.unit_edges: Dict[int, array] = {}
+        self.dependents: Dict[int, Set[int]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self.unit_edges)
+
+    def file_id(self, path: str) -> int:
+        key = _key(path)
+        file_id = self._ids.get(key)
+        if file_id is None:
+            file_id = self._ids[key] = len(self.files)
+            self.files.append(key)
+        return file_id
+
+    def record(self, unit: str, inclusions: Iterable[Tuple[str, str]]) -> None:
+        """Replace the include edges of a unit with the given (includer, included) pairs."""
+        unit_id = self.file_id(unit)
+        self.forget([unit])
+        edges = array('I')
+        for includer, included in inclusions:
+            included_id = self.file_id(included)
+            edges.extend((self.file_id(includer), included_id))
+            self.dependents[included_id].add(unit_id)
+        self.unit_edges[unit_id] = edges
+
+    def forget(self, units: Iterable[str]) -> None:
+        for unit in units:
+            unit_id = self._ids.get(_key(unit))
+            edges = self.unit_edges.pop(unit_id, None) if unit_id is not None else None
+            for included_id in edges[1::2] if edges is not None else ():
+                self.dependents[included_id].discard(unit_id)
+
+    def headers_of(self, unit: str) -> List[str]:
+        """Return every file the unit includes, directly or transitively."""
+        edges = self.unit_edges.get(self._ids.get(_key(unit)), array('I'))
+        return [self.files[file_id] for file_id in sorted(set(edges[1::2]))]
+
+    def dependent_units(self, header: str) -> List[str]:
+        """Return the units that include the header, directly or transitively."""
+        return sorted(self.files[unit_id] for unit_id in self.dependents.get(self._ids.get(_key(header)), ()))
+
+    def affected(self, changed: Iterable[str]) -> Set[str]:
+        """Return the changed files plus every unit that includes one of them."""
+        affected: Set[str] = set()
+        for path in changed:
+            affected.add(_key(path))
+            for unit_id in self.dependents.get(self._ids.get(_key(path)), ()):
+                affected.add(self.files[unit_id])
+        return affected
+
+    def edges(self) -> Set[Tuple[int, int]]:
+        """Return the distinct (includer ID, included ID) edges of all units."""
+        pairs: Set[Tuple[int, int]] = set()
+        for edges in self.unit_edges.values():
+            pairs.update(zip(edges[0::2], edges[1::2]))
+        return pairs
+
+    def module_edges(self, project_root: str) -> Counter:
+        """Count the include edges between modules (directories relative to the project root)."""
+        root = _key(project_root)
+        modules = [os.path.relpath(os.path.dirname(file), root).replace(os.sep, '/') for file in self.files]
+        return Counter((modules[includer], modules[included]) for includer, included in self.edges()
+                       if modules[includer] != modules[included])
+
+    def as_dict(self) -> dict:
+        return {
+            "files": self.files,
+            "units": {str(unit_id): edges.tolist() for unit_id, edges in self.unit_edges.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "IncludeGraph":
+        graph = cls()
+        for path in data["files"]:
+            graph.file_id(path)
+        for unit_id, edges in data["units"].items():
+            unit_id = int(unit_id)
+            graph.unit_edges[unit_id] = array('I', edges)
+            for included_id in edges[1::2]:
+                graph.dependents[included_id].add(unit_id)
+        return graph
+
+    def to_dot(self, project_root: str) -> str:
+        """Render the module dependency view as a Graphviz digraph weighted by edge count."""
+        lines = ["digraph modules {", "    rankdir=LR;", "    node [shape=box];"]
+        for (includer, included), count in sorted(self.module_edges(project_root).items()):
+            lines.append(f'    "{includer}" -> "{included}" [label="{count}"];')
+        lines.append("}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,78 @@
+import os
+import re
+import subprocess
+from collections import defaultdict
+from typing import List, Set, Dict
+from call_tree import CallTree
+from project import ProjectAnalyzer, SOURCE_EXTENSIONS, HEADER_EXTENSIONS
+
+
+INCLUDE_PATTERN = re.compile(rb'^\s*#\s*include\s*[<"]([^>"]+)[>"]', re.MULTILINE)
+
+
+def changed_files(project_root: str, rev: str) -> List[str]:
+    """
+    Return the C sources and headers under the project root changed since `rev`.
+    Renames are listed as a deletion plus an addition, so the old path is removed too.
+    """
+    output = subprocess.run(
+        ["git", "diff", "--name-only", "--no-renames", "--relative", rev, "--", "."],
+        cwd=project_root, capture_output=True, text=True, check=True).stdout
+    return [os.path.join(project_root, path) for path in output.splitlines()
+            if path.endswith(SOURCE_EXTENSIONS + HEADER_EXTENSIONS)]
+
+
+def _includers(analyzer: ProjectAnalyzer) -> Dict[str, Set[str]]:
+    """
+    Map every included header base name to the project files that include it,
+    using a textual scan of the `#include` directives.
+    """
+    includers: Dict[str, Set[str]] = defaultdict(set)
+    scan = analyzer.scan()
+    for path in scan.sources + scan.headers:
+        with open(path, "rb") as source:
+            for include in INCLUDE_PATTERN.findall(source.read()):
+                includers[os.path.basename(include.decode(errors="replace"))].add(path)
+    return includers
+
+
+def affected_units(analyzer: ProjectAnalyzer, changed: List[str]) -> Set[str]:
+    """Expand changed files to every file that includes them, directly or transitively."""
+    includers = _includers(analyzer)
+    affected: Set[str] = set()
+    pending = [os.path.abspath(path) for path in changed]
+    while pending:
+        path = pending.pop()
+        if path in affected:
+            continue
+        affected.add(path)
+        pending.extend(os.path.abspath(includer)
+                       for includer in includers.get(os.path.basename(path), ()))
+    return affected
+
+
+def update_since(call_tree: CallTree, analyzer: ProjectAnalyzer, rev: str) -> None:
+    """
+    Patch a previously saved call tree by re-parsing only the TUs affected since `rev`.
+    Functions of the affected files that are no longer defined nor called are dropped.
+    Raises subprocess.CalledProcessError if git cannot diff the project against `rev`.
+    """
+    changed = changed_files(analyzer.project_root, rev)
+    if call_tree.includes:
+        # The include graph saved with the tree already knows every unit depending on a file
+        affected = call_tree.includes.affected(changed)
+    else:
+        affected = affected_units(analyzer, changed)
+    stale = call_tree.remove_files(affected)
+
+    # Re-parsed with the scanned spelling of the path, as in the full build
+    sources = {os.path.abspath(path): path for path in analyzer.get_source_files()}
+    units = sorted(sources[path] for path in affected if path in sources)
+    print(f"{len(changed)} changed files, re-parsing {len(units)} translation units")
+    for source_file in units:
+        tu = analyzer.get_translation_unit(source_file)
+        if tu:
+            call_tree.build(tu)
+    dropped = call_tree.prune(stale)
+    if dropped:
+        print(f"{dropped} functions no longer defined dropped")
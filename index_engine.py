@@ -0,0 +1,190 @@
+import os
+import sys
+from ctypes import (CFUNCTYPE, POINTER, Structure, byref, c_char_p, c_int, c_uint,
+                    c_void_p, sizeof)
+from typing import Dict, List, Optional
+from clang.cindex import Cursor, Index, TranslationUnit, c_object_p, conf
+from call_tree import FUNC_KINDS, CallTree, UnitRecords
+from project import ProjectAnalyzer
+from symbols import FunctionInfo
+
+
+# Subset of clang-c/Index.h used by clang_indexSourceFile
+CXSymbolRole_Call = 1 << 5
+
+
+class CXIdxLoc(Structure):
+    _fields_ = [("ptr_data", c_void_p * 2), ("int_data", c_uint)]
+
+
+class CXIdxEntityInfo(Structure):
+    _fields_ = [("kind", c_int), ("templateKind", c_int), ("lang", c_int),
+                ("name", c_char_p), ("USR", c_char_p),
+                ("attributes", c_void_p), ("numAttributes", c_uint)]
+
+
+class CXIdxContainerInfo(Structure):
+    _fields_ = [("cursor", Cursor)]
+
+
+class CXIdxDeclInfo(Structure):
+    _fields_ = [("entityInfo", POINTER(CXIdxEntityInfo)), ("cursor", Cursor), ("loc", CXIdxLoc),
+                ("semanticContainer", POINTER(CXIdxContainerInfo)),
+                ("lexicalContainer", POINTER(CXIdxContainerInfo)),
+                ("isRedeclaration", c_int), ("isDefinition", c_int), ("isContainer", c_int),
+                ("declAsContainer", POINTER(CXIdxContainerInfo)), ("isImplicit", c_int),
+                ("attributes", c_void_p), ("numAttributes", c_uint), ("flags", c_uint)]
+
+
+class CXIdxEntityRefInfo(Structure):
+    _fields_ = [("kind", c_int), ("cursor", Cursor), ("loc", CXIdxLoc),
+                ("referencedEntity", POINTER(CXIdxEntityInfo)),
+                ("parentEntity", POINTER(CXIdxEntityInfo)),
+                ("container", POINTER(CXIdxContainerInfo)), ("role", c_int)]
+
+
+# Callbacks take raw addresses: building ctypes pointer objects for every declaration costs more
+IndexDeclaration = CFUNCTYPE(None, c_void_p, c_void_p)
+IndexEntityReference = CFUNCTYPE(None, c_void_p, c_void_p)
+IS_DEFINITION_OFFSET = CXIdxDeclInfo.isDefinition.offset
+ROLE_OFFSET = CXIdxEntityRefInfo.role.offset
+
+
+class IndexerCallbacks(Structure):
+    _fields_ = [("abortQuery", c_void_p), ("diagnostic", c_void_p),
+                ("enteredMainFile", c_void_p), ("ppIncludedFile", c_void_p),
+                ("importedASTFile", c_void_p), ("startedTranslationUnit", c_void_p),
+                ("indexDeclaration", IndexDeclaration),
+                ("indexEntityReference", IndexEntityReference)]
+
+
+def _register(lib) -> None:
+    """Declare the indexing functions, which the Python bindings do not wrap."""
+    lib.clang_IndexAction_create.argtypes = [c_void_p]
+    lib.clang_IndexAction_create.restype = c_void_p
+    lib.clang_IndexAction_dispose.argtypes = [c_void_p]
+    lib.clang_IndexAction_dispose.restype = None
+    lib.clang_indexSourceFile.argtypes = [
+        c_void_p, c_void_p, POINTER(IndexerCallbacks), c_uint, c_uint, c_char_p,
+        POINTER(c_char_p), c_int, c_void_p, c_uint, POINTER(c_object_p), c_uint]
+    lib.clang_indexSourceFile.restype = c_int
+
+
+class _PendingUnit:
+    """Stands in for the translation unit while clang_indexSourceFile is still running."""
+
+
+class IndexExtractor:
+    """
+    Extract a translation unit through libclang's indexing callbacks.
+
+    Instead of visiting every cursor from Python, libclang walks the AST itself and
+    only calls back for declarations and entity references; definitions of functions
+    and references with the call role become the same records `CallTree.extract`
+    produces.
+    """
+
+    def __init__(self, call_tree: CallTree):
+        self.call_tree = call_tree
+        self.index: Index = Index.create()
+        self.records: Optional[UnitRecords] = None
+        # Callers and callees of the current unit by USR, None when they are not tracked.
+        # Kept apart: any function may call, but only tracked ones may be called
+        self._callers: Dict[bytes, Optional[FunctionInfo]] = {}
+        self._callees: Dict[bytes, Optional[FunctionInfo]] = {}
+        self._pending = _PendingUnit()
+        _register(conf.lib)
+        # Keep the ctypes trampolines alive as long as the extractor
+        self.callbacks = IndexerCallbacks(
+            indexDeclaration=IndexDeclaration(self._on_declaration),
+            indexEntityReference=IndexEntityReference(self._on_reference))
+
+    def _cursor(self, cursor: Cursor) -> Cursor:
+        """Copy a cursor out of callback memory so the bindings can use it."""
+        copy = Cursor.from_buffer_copy(cursor)
+        copy._tu = self._pending
+        return copy
+
+    def _on_declaration(self, _, address: int) -> None:
+        if not c_int.from_address(address + IS_DEFINITION_OFFSET).value:
+            return
+        info = CXIdxDeclInfo.from_address(address)
+        if info.isImplicit:
+            return
+        cursor = self._cursor(info.cursor)
+        if cursor.kind in FUNC_KINDS and self.call_tree.in_project(CallTree.file_of(cursor)):
+            self.records.definitions.append(FunctionInfo(cursor))
+
+    def _function(self, entity, cursor: Cursor, callee: bool) -> Optional[FunctionInfo]:
+        """Return the FunctionInfo of an indexed entity, built from its first cursor."""
+        usr = entity.contents.USR if entity else None
+        functions = self._callees if callee else self._callers
+        if usr in functions:
+            return functions[usr]
+        cursor = self._cursor(cursor)
+        if callee:
+            cursor = cursor.referenced
+        info = None
+        if cursor is not None and cursor.kind in FUNC_KINDS and \
+                (not callee or self.call_tree.is_tracked(cursor)):
+            info = FunctionInfo(cursor)
+        if usr:
+            functions[usr] = info
+        return info
+
+    def _on_reference(self, _, address: int) -> None:
+        if not c_int.from_address(address + ROLE_OFFSET).value & CXSymbolRole_Call:
+            return
+        info = CXIdxEntityRefInfo.from_address(address)
+        if not info.container:
+            return
+        caller = self._function(info.parentEntity, info.container.contents.cursor, callee=False)
+        callee = caller and self._function(info.referencedEntity, info.cursor, callee=True)
+        if callee is None:
+            return
+        # A call expression starts where its callee expression does (`obj.method`, `ns::f`)
+        location = self._cursor(info.cursor).extent.start
+        self.records.calls.append((caller, callee,
+                                   location.file.name if location.file else caller.file,
+                                   location.line, location.column))
+
+    def extract(self, analyzer: ProjectAnalyzer, source_file: str) -> Optional[UnitRecords]:
+        """Parse and index one file, returning its records or None if it has errors."""
+        args: List[bytes] = [arg.encode() for arg in analyzer.get_parse_arguments(source_file)]
+        tu_handle = c_object_p()
+        self.records = UnitRecords(source_file)
+        action = conf.lib.clang_IndexAction_create(self.index.obj)
+        # libclang otherwise indexes on a helper thread, and every callback from a thread
+        # Python does not know has to set up a fresh thread state. It reads the variable
+        # per call, so it is set for this call only
+        threads = os.environ.get("LIBCLANG_NOTHREADS")
+        os.environ["LIBCLANG_NOTHREADS"] = "1"
+        try:
+            conf.lib.clang_indexSourceFile(
+                action, None, byref(self.callbacks), sizeof(IndexerCallbacks), 0,
+                source_file.encode(), (c_char_p * len(args))(*args), len(args), None, 0,
+                byref(tu_handle), TranslationUnit.PARSE_DETAILED_PROCESSING_RECORD)
+        finally:
+            if threads is None:
+                del os.environ["LIBCLANG_NOTHREADS"]
+            else:
+                os.environ["LIBCLANG_NOTHREADS"] = threads
+            conf.lib.clang_IndexAction_dispose(action)
+        records, self.records = self.records, None
+        self._callers.clear()
+        self._callees.clear()
+        if not tu_handle:
+            print(f"[ERROR] {source_file}: unable to parse", file=sys.stderr)
+            return None
+        tu = TranslationUnit(tu_handle, self.index)
+        records.includes = self.call_tree.inclusions(tu)
+        return records if analyzer.check_diagnostics(tu) else None
+
+
+def build(analyzer: ProjectAnalyzer, call_tree: CallTree) -> None:
+    """Build the call tree from libclang's indexer callbacks instead of a cursor walk."""
+    extractor = IndexExtractor(call_tree)
+    for source_file in analyzer.get_source_files():
+        records = extractor.extract(analyzer, source_file)
+        if records is not None:
+            call_tree.merge(records)
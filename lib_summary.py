@@ -0,0 +1,92 @@
+import os
+import json
+from collections import defaultdict
+from typing import List, Dict, Set
+from call_tree import CallTree
+from symbols import FunctionInfo
+
+
+SUMMARY_VERSION = 1
+
+
+def is_exported(info: FunctionInfo) -> bool:
+    """Functions with external linkage have no file in their USR (`c:@F@f`, unlike `c:lib.c@F@f`)."""
+    return info.is_definition and info.usr.startswith("c:@")
+
+
+def write_summary(call_tree: CallTree) -> dict:
+    """
+    Save the library analyzed by the call tree as calltree_summary.json: every
+    function, the exported ones, and the call sites between them.
+    """
+    files: Dict[str, int] = {}
+    summary = {
+        "version": SUMMARY_VERSION,
+        "library": os.path.abspath(call_tree.project_root),
+        "functions": [info.to_dict() for info in call_tree.symbols.functions],
+        "exports": [info.id for info in call_tree.symbols.functions if is_exported(info)],
+        "sites": [[caller_id, callee_id, files.setdefault(file, len(files)), line, column]
+                  for caller_id, callee_id, file, line, column in call_tree.sites.sites()],
+    }
+    summary["files"] = list(files)
+
+    summary_filepath = os.path.join(call_tree.project_root, "calltree_summary.json")
+    with open(summary_filepath, "w") as summary_file:
+        json.dump(summary, summary_file, separators=(',', ':'))
+    print(f"Library summary with {len(summary['exports'])} exported functions saved at {summary_filepath}")
+    return summary
+
+
+def load_summaries(paths: List[str]) -> List[dict]:
+    summaries: List[dict] = []
+    for path in paths:
+        if os.path.isdir(path):
+            path = os.path.join(path, "calltree_summary.json")
+        with open(path) as summary_file:
+            summaries.append(json.load(summary_file))
+    return summaries
+
+
+def exported_usrs(summaries: List[dict]) -> Set[str]:
+    """Return the USRs of all exported functions, for `CallTree.library_usrs`."""
+    return {summary["functions"][i]["usr"] for summary in summaries for i in summary["exports"]}
+
+
+def stitch(call_tree: CallTree, summaries: List[dict]) -> None:
+    """
+    Link the project's calls into the libraries. Every exported function the project
+    calls takes the library's definition, and the library's call sites reachable from
+    it are added, so the graph continues through the library without parsing it.
+    """
+    for summary in summaries:
+        functions = summary["functions"]
+        files = summary["files"]
+        sites_by_caller: Dict[int, List[list]] = defaultdict(list)
+        for site in summary["sites"]:
+            sites_by_caller[site[0]].append(site)
+
+        pending = [i for i in summary["exports"] if functions[i]["usr"] in call_tree.symbols]
+        reached = set(pending)
+        infos: Dict[int, FunctionInfo] = {}
+
+        def intern(index: int) -> FunctionInfo:
+            if index not in infos:
+                infos[index] = call_tree.symbols.intern(FunctionInfo.from_dict(functions[index]))
+            return infos[index]
+
+        for index in pending:
+            intern(index)
+        while pending:
+            caller_index = pending.pop()
+            caller = intern(caller_index)
+            # Edges already there were stitched before (e.g. into a graph updated with --since)
+            existing = set(call_tree.tree.get(caller, ()))
+            for _, callee_index, file_index, line, column in sites_by_caller[caller_index]:
+                callee = intern(callee_index)
+                if callee not in existing:
+                    call_tree.tree[caller].add(callee)
+                    call_tree.sites.add(caller.id, callee.id, files[file_index], line, column)
+                if callee_index not in reached:
+                    reached.add(callee_index)
+                    pending.append(callee_index)
+        print(f"{summary['library']}: {len(infos)} library functions stitched")
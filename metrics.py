@@ -0,0 +1,203 @@
+import os
+import csv
+from typing import Dict, List, Optional
+from call_tree import CallTree
+
+try:
+    import numpy as np
+    from scipy import sparse
+    from scipy.sparse import csgraph
+except ImportError:  # numpy and scipy are only needed for the metrics
+    np = None
+
+
+METRICS = ["fan_in", "fan_out", "reach", "betweenness"]
+# Reachability is propagated for this many target components at a time
+CHUNK_BITS = 4096
+# Sources searched together by the batched betweenness BFS
+SOURCE_BATCH = 32
+# Successor rows gathered at once while propagating reachability
+GATHER_EDGES = 1 << 16
+
+
+def _require_scipy():
+    if np is None:
+        raise ImportError("numpy and scipy are required for metrics, install them with 'pip install numpy scipy'")
+
+
+def adjacency(call_tree: CallTree) -> "sparse.csr_matrix":
+    """Return the caller x callee adjacency matrix, indexed by function ID."""
+    _require_scipy()
+    n = len(call_tree.symbols.functions)
+    callers = np.fromiter((caller.id for caller, callees in call_tree.tree.items() for _ in callees), dtype=np.int32)
+    callees = np.fromiter((callee.id for callees in call_tree.tree.values() for callee in callees), dtype=np.int32)
+    return sparse.csr_matrix((np.ones(len(callers), dtype=np.int8), (callers, callees)), shape=(n, n))
+
+
+def _levels(dag: "sparse.csr_matrix") -> List["np.ndarray"]:
+    """Peel a DAG from its sinks: level i holds the nodes whose longest path to a sink is i."""
+    out_degree = np.diff(dag.indptr)
+    predecessors = dag.T.tocsr()
+    frontier = np.flatnonzero(out_degree == 0)
+    levels = []
+    while frontier.size:
+        levels.append(frontier)
+        removed = np.bincount(predecessors[frontier].indices, minlength=dag.shape[0])
+        out_degree = out_degree - removed
+        frontier = np.flatnonzero((removed > 0) & (out_degree == 0))
+    return levels
+
+
+def _popcount(bits: "np.ndarray") -> "np.ndarray":
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bits).sum(axis=1, dtype=np.int64)
+    return np.unpackbits(bits.view(np.uint8), axis=1).sum(axis=1, dtype=np.int64)
+
+
+def reach(matrix: "sparse.csr_matrix") -> "np.ndarray":
+    """
+    Count the distinct functions every function reaches transitively.
+
+    Strongly connected components are condensed first. Each component then gets a
+    bitset of the components it reaches, built level by level from the sinks up by
+    OR-ing the bitsets of its successors. The bitsets cover CHUNK_BITS components at
+    a time to bound memory.
+    """
+    _require_scipy()
+    n_components, labels = csgraph.connected_components(matrix, directed=True, connection="strong")
+    sizes = np.bincount(labels, minlength=n_components)
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    sources, targets = labels[rows], labels[matrix.indices]
+    between = sources != targets
+    dag = sparse.csr_matrix((np.ones(between.sum(), dtype=np.int8), (sources[between], targets[between])),
+                            shape=(n_components, n_components))
+    dag.sum_duplicates()
+
+    # Every level above the sinks, split so that one gather stays within GATHER_EDGES rows
+    blocks = []
+    for level in _levels(dag)[1:]:
+        degrees = np.diff(dag.indptr)[level]
+        cuts = np.searchsorted(np.cumsum(degrees), np.arange(GATHER_EDGES, degrees.sum(), GATHER_EDGES))
+        for block in np.split(level, np.unique(cuts)):
+            if not block.size:
+                continue
+            successors = dag[block]
+            blocks.append((block, successors.indices, successors.indptr[:-1]))
+
+    counts = np.zeros(n_components, dtype=np.int64)
+    for start in range(0, n_components, CHUNK_BITS):
+        stop = min(start + CHUNK_BITS, n_components)
+        bits = np.zeros((n_components, (stop - start + 63) // 64), dtype=np.uint64)
+        own = np.arange(stop - start)
+        bits[own + start, own // 64] = np.left_shift(np.uint64(1), (own % 64).astype(np.uint64))
+        for block, successors, offsets in blocks:
+            bits[block] |= np.bitwise_or.reduceat(bits[successors], offsets, axis=0)
+        counts += _popcount(bits)
+        # Components of several functions count for all of them
+        for component in np.flatnonzero(sizes[start:stop] > 1):
+            has = (bits[:, component // 64] >> np.uint64(component % 64)) & np.uint64(1)
+            counts += has.astype(np.int64) * (sizes[start + component] - 1)
+    # A function does not count itself
+    return counts[labels] - 1
+
+
+def betweenness(matrix: "sparse.csr_matrix", samples: Optional[int] = 256, seed: int = 0) -> "np.ndarray":
+    """
+    Estimate betweenness centrality with Brandes' algorithm from a random sample of
+    sources (all of them when `samples` is None or covers the graph), scaled up to
+    the full graph. SOURCE_BATCH sources advance together, so every BFS level and
+    every dependency accumulation step is one product of the level's submatrix.
+    """
+    _require_scipy()
+    n = matrix.shape[0]
+    forward = matrix.astype(np.float64).tocsr()
+    if samples is None or samples >= n:
+        sources = np.arange(n)
+    else:
+        sources = np.random.default_rng(seed).choice(n, samples, replace=False)
+    centrality = np.zeros(n)
+    marked = np.zeros(n, dtype=bool)
+    for start in range(0, len(sources), SOURCE_BATCH):
+        batch = sources[start:start + SOURCE_BATCH]
+        columns = np.arange(len(batch))
+        visited = np.zeros((n, len(batch)), dtype=bool)
+        visited[batch, columns] = True
+
+        # BFS restricted to the rows of the current level. Each step keeps the
+        # level-to-level submatrix and the path counts on both of its sides
+        rows = np.unique(batch)
+        frontier = np.zeros((len(rows), len(batch)))
+        frontier[np.searchsorted(rows, batch), columns] = 1
+        steps = []
+        while True:
+            outgoing = forward[rows]
+            marked[outgoing.indices] = True
+            targets = np.flatnonzero(marked)
+            marked[targets] = False
+            if not targets.size:
+                break
+            step = outgoing[:, targets]
+            paths = step.T @ frontier
+            paths[visited[targets]] = 0
+            reached = paths > 0
+            keep = reached.any(axis=1)
+            if not keep.any():
+                break
+            targets, paths, step = targets[keep], paths[keep], step[:, keep]
+            visited[targets] |= reached[keep]
+            steps.append((frontier, targets, paths, step))
+            rows, frontier = targets, paths
+
+        # Dependencies flow back one level at a time; the sources' own are left out
+        dependency = None
+        for frontier, targets, paths, step in reversed(steps):
+            if dependency is not None:
+                centrality[targets] += dependency.sum(axis=1)
+                coefficients = np.divide(1 + dependency, paths, out=np.zeros(paths.shape), where=paths > 0)
+            else:
+                coefficients = np.divide(1, paths, out=np.zeros(paths.shape), where=paths > 0)
+            dependency = frontier * (step @ coefficients)
+    return centrality * (n / max(len(sources), 1))
+
+
+def compute(call_tree: CallTree, samples: Optional[int] = 256, seed: int = 0) -> Dict[str, "np.ndarray"]:
+    """Compute every metric, as arrays indexed by function ID."""
+    matrix = adjacency(call_tree)
+    return {
+        "fan_in": np.bincount(matrix.indices, minlength=matrix.shape[0]),
+        "fan_out": np.diff(matrix.indptr),
+        "reach": reach(matrix),
+        "betweenness": betweenness(matrix, samples, seed),
+    }
+
+
+def node_sizes(values: "np.ndarray", smallest: float = 1.0, largest: float = 4.0) -> Dict[int, float]:
+    """Scale a metric to node size factors by function ID, by square root so hubs do not dwarf the rest."""
+    _require_scipy()
+    top = values.max() if len(values) else 0
+    scaled = np.sqrt(values / top) if top > 0 else np.zeros(len(values))
+    return dict(enumerate(np.round(smallest + (largest - smallest) * scaled, 2).tolist()))
+
+
+def write_metrics(call_tree: CallTree, metrics: Dict[str, "np.ndarray"], sort_by: str = "betweenness",
+                  top: Optional[int] = 20) -> None:
+    """Print the `top` functions ranked by one metric and save the full table as calltree_metrics.csv."""
+    functions = call_tree.symbols.functions
+    order = np.lexsort((np.arange(len(functions)), -metrics[sort_by]))
+
+    metrics_filepath = os.path.join(call_tree.project_root, "calltree_metrics.csv")
+    with open(metrics_filepath, "w", newline="") as metrics_file:
+        writer = csv.writer(metrics_file)
+        writer.writerow(["function", "file", "line"] + METRICS)
+        for function_id in order.tolist():
+            info = functions[function_id]
+            writer.writerow([info.name, info.file, info.line] +
+                            [round(metrics[metric][function_id].item(), 2) for metric in METRICS])
+
+    name_width = max([len("function")] + [len(functions[i].name) for i in order[:top].tolist()])
+    print(f"{'function':<{name_width}}  " + "  ".join(f"{metric:>11}" for metric in METRICS))
+    for function_id in order[:top].tolist():
+        print(f"{functions[function_id].name:<{name_width}}  " +
+              "  ".join(f"{float(metrics[metric][function_id]):>11.1f}" if metric == "betweenness" else
+                        f"{int(metrics[metric][function_id]):>11}" for metric in METRICS))
+    print(f"Metrics of {len(functions)} functions saved at {metrics_filepath}")
@@ -0,0 +1,174 @@
+import os
+import sys
+import json
+import time
+import multiprocessing
+from multiprocessing.connection import Connection, wait
+from typing import List, Dict, Optional, Set, Tuple
+from clang.cindex import TranslationUnit
+from bounded import current_rss
+from call_tree import CallTree, UnitRecords
+from project import ProjectAnalyzer
+
+
+# Parse options tried in turn for a file that exceeded a limit, from the full parse down
+PARSE_LEVELS: List[Tuple[str, int]] = [
+    ("full", TranslationUnit.PARSE_DETAILED_PROCESSING_RECORD),
+    ("no preprocessing record", TranslationUnit.PARSE_NONE),
+    ("skipped function bodies", TranslationUnit.PARSE_SKIP_FUNCTION_BODIES),
+]
+POLL_INTERVAL = 0.1
+
+
+def _serve(connection: Connection, analyzer: ProjectAnalyzer, library_usrs: Set[str]) -> None:
+    """Worker process loop: parse and extract each (file, level) task, sending back the records."""
+    call_tree = CallTree(analyzer.project_root)
+    call_tree.library_usrs = library_usrs
+    while (task := connection.recv()) is not None:
+        source_file, level = task
+        tu = analyzer.get_translation_unit(source_file, PARSE_LEVELS[level][1])
+        connection.send(call_tree.extract(tu) if tu else None)
+        del tu
+
+
+class _Slot:
+    """One supervised worker process and the task it is running."""
+
+    def __init__(self, context, analyzer: ProjectAnalyzer, call_tree: CallTree):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child, analyzer, call_tree.library_usrs), daemon=True)
+        self.process.start()
+        child.close()
+        self.task: Optional[Tuple[str, int]] = None
+        self.started: float = 0.0
+        # Forked workers share the parent's pages, so only the growth over the RSS
+        # at task start is charged to the task
+        self.baseline: int = 0
+        self.peak: int = 0
+
+    def run(self, task: Tuple[str, int]) -> None:
+        self.task, self.started, self.peak = task, time.monotonic(), 0
+        self.baseline = current_rss(self.process.pid)
+        self.connection.send(task)
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+    def stop(self) -> None:
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join()
+        self.connection.close()
+
+
+class Watchdog:
+    """
+    Parse every translation unit in supervised worker processes, so one pathological
+    file cannot stall the run.
+
+    A worker exceeding the time limit or the memory limit (RSS growth since the task
+    started) is killed and replaced, and its file is recorded as an offender. With
+    `retry`, the file is queued again with the next reduced parse level of
+    PARSE_LEVELS until one finishes within the limits. Workers are spawned, as on
+    Windows, and receive the scanned analyzer and the library USRs to extract with.
+    """
+
+    def __init__(self, analyzer: ProjectAnalyzer, call_tree: CallTree, timeout: Optional[float] = None,
+                 memory_mb: Optional[int] = None, workers: int = os.cpu_count() or 1, retry: bool = False):
+        self.analyzer = analyzer
+        self.call_tree = call_tree
+        self.timeout: Optional[float] = timeout
+        self.memory: Optional[int] = memory_mb * 1024 * 1024 if memory_mb else None
+        self.workers: int = max(1, workers)
+        self.retry: bool = retry
+        self.offenders: List[dict] = []
+        self.recovered: Dict[str, str] = {}
+        # Fork is unavailable on Windows; spawned workers do not re-run __main__, which
+        # is started as a package and thus skipped when the child sets up its main module
+        self._context = multiprocessing.get_context("spawn")
+
+    def _exceeded(self, slot: _Slot) -> Optional[str]:
+        """Return the limit the slot's task has exceeded, if any."""
+        if self.timeout is not None and time.monotonic() - slot.started > self.timeout:
+            return "time"
+        if self.memory is not None:
+            slot.peak = max(slot.peak, current_rss(slot.process.pid) - slot.baseline)
+            if slot.peak > self.memory:
+                return "memory"
+        return None
+
+    def _offend(self, slot: _Slot, reason: str, pending: List[Tuple[str, int]]) -> None:
+        source_file, level = slot.task
+        self.offenders.append({
+            "file": source_file,
+            "reason": reason,
+            "options": PARSE_LEVELS[level][0],
+            "seconds": round(time.monotonic() - slot.started, 1),
+            "rss_mb": round(slot.peak / (1024 * 1024), 1)
+        })
+        print(f"[WARNING] {source_file}: worker killed ({reason} limit, {PARSE_LEVELS[level][0]} parse)",
+              file=sys.stderr)
+        if self.retry and level + 1 < len(PARSE_LEVELS):
+            pending.append((source_file, level + 1))
+        slot.task = None
+
+    def _finish(self, slot: _Slot, records: Optional[UnitRecords]) -> None:
+        source_file, level = slot.task
+        if records is not None:
+            self.call_tree.merge(records)
+            if level:
+                self.recovered[source_file] = PARSE_LEVELS[level][0]
+        slot.task = None
+
+    def build(self) -> None:
+        pending: List[Tuple[str, int]] = [(source_file, 0) for source_file in reversed(self.analyzer.get_source_files())]
+        # Scan once here so every worker receives the include directories
+        self.analyzer.scan()
+        slots = [_Slot(self._context, self.analyzer, self.call_tree)
+                 for _ in range(min(self.workers, len(pending)))]
+        try:
+            while True:
+                for slot in slots:
+                    if slot.task is None and pending:
+                        slot.run(pending.pop())
+                busy = {slot.connection: slot for slot in slots if slot.task is not None}
+                if not busy:
+                    break
+                for connection in wait(list(busy), POLL_INTERVAL):
+                    slot = busy[connection]
+                    try:
+                        self._finish(slot, connection.recv())
+                    except (EOFError, OSError):
+                        # The parser crashed the worker (e.g. aborted on an allocation failure)
+                        slot.kill()
+                        self._offend(slot, "crash", pending)
+                        slots[slots.index(slot)] = _Slot(self._context, self.analyzer, self.call_tree)
+                for slot in list(busy.values()):
+                    reason = slot.task is not None and self._exceeded(slot)
+                    if reason:
+                        slot.kill()
+                        self._offend(slot, reason, pending)
+                        slots[slots.index(slot)] = _Slot(self._context, self.analyzer, self.call_tree)
+        finally:
+            for slot in slots:
+                slot.stop()
+        if self.offenders:
+            self.write_report()
+
+    def write_report(self) -> None:
+        """Save the killed parses and the files recovered with reduced options as calltree_watchdog.json."""
+        report = {
+            "timeout": self.timeout,
+            "memory_mb": self.memory // (1024 * 1024) if self.memory else None,
+            "offenders": self.offenders,
+            "recovered": [{"file": file, "options": options} for file, options in self.recovered.items()],
+            "skipped": sorted({offender["file"] for offender in self.offenders} - set(self.recovered))
+        }
+        report_filepath = os.path.join(self.call_tree.project_root, "calltree_watchdog.json")
+        with open(report_filepath, "w") as report_file:
+            json.dump(report, report_file, indent=4)
+        print(f"Watchdog report saved at {report_filepath} ({len(report['skipped'])} files skipped)")
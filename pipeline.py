@@ -0,0 +1,91 @@
+import os
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, TextIO
+from call_tree import CallTree, UnitRecords
+from project import ProjectAnalyzer
+
+
+_DONE = None
+
+
+def _parse_and_extract(analyzer: ProjectAnalyzer, call_tree: CallTree,
+                       source_file: str) -> Optional[UnitRecords]:
+    """Parse one file and walk it into records; runs on an executor thread."""
+    tu = analyzer.get_translation_unit(source_file)
+    if tu is None:
+        return None
+    records = call_tree.extract(tu)
+    del tu
+    return records
+
+
+async def _discover(analyzer: ProjectAnalyzer, files: asyncio.Queue, workers: int) -> None:
+    """
+    Feed source files to the parse workers. The directory walk itself is not
+    overlapped: parsing needs the complete include path, so the single cached scan
+    finishes before the first file is handed out.
+    """
+    loop = asyncio.get_running_loop()
+    source_files = analyzer.iter_source_files()
+    while (source_file := await loop.run_in_executor(None, next, source_files, _DONE)) is not _DONE:
+        await files.put(source_file)
+    for _ in range(workers):
+        await files.put(_DONE)
+
+
+async def _parse(executor: ThreadPoolExecutor, analyzer: ProjectAnalyzer, call_tree: CallTree,
+                 files: asyncio.Queue, units: asyncio.Queue) -> None:
+    """Parse and walk files from the queue, passing the records of each TU on."""
+    loop = asyncio.get_running_loop()
+    while (source_file := await files.get()) is not _DONE:
+        records = await loop.run_in_executor(executor, _parse_and_extract, analyzer, call_tree, source_file)
+        if records is not None:
+            await units.put(records)
+    await units.put(_DONE)
+
+
+async def _write(call_tree: CallTree, units: asyncio.Queue, workers: int,
+                 edge_stream: Optional[TextIO]) -> None:
+    """Merge finished TUs into the call tree and stream their edges as JSON lines."""
+    finished = 0
+    while finished < workers:
+        records = await units.get()
+        if records is _DONE:
+            finished += 1
+            continue
+        call_tree.merge(records)
+        if edge_stream is not None:
+            edge_stream.write(json.dumps({
+                "unit": records.source_file,
+                "calls": [[caller.name, callee.name, file, line, column]
+                          for caller, callee, file, line, column in records.calls]
+            }) + "\n")
+            edge_stream.flush()
+        print(f"[{records.source_file}] {len(records.calls)} calls")
+
+
+async def run(analyzer: ProjectAnalyzer, call_tree: CallTree, workers: int = os.cpu_count() or 1,
+              queue_size: int = 16, edge_stream: Optional[TextIO] = None) -> None:
+    """
+    Build the call tree with discovery, parsing and writing overlapped.
+
+    The stages are connected by bounded queues, so a slow writer or parser holds
+    back the stages before it instead of letting records pile up in memory.
+    """
+    files: asyncio.Queue = asyncio.Queue(queue_size)
+    units: asyncio.Queue = asyncio.Queue(queue_size)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        await asyncio.gather(
+            _discover(analyzer, files, workers),
+            _write(call_tree, units, workers, edge_stream),
+            *(_parse(executor, analyzer, call_tree, files, units) for _ in range(workers)))
+
+
+def build(analyzer: ProjectAnalyzer, call_tree: CallTree, workers: int = os.cpu_count() or 1) -> None:
+    """Run the pipeline, streaming edges to calltree.edges.jsonl in the project directory."""
+    edges_filepath = os.path.join(call_tree.project_root, "calltree.edges.jsonl")
+    with open(edges_filepath, "w") as edge_stream:
+        asyncio.run(run(analyzer, call_tree, workers, edge_stream=edge_stream))
+    print(f"Edge stream saved at {edges_filepath}")
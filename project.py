@@ -1,45 +1,139 @@
 import os
 import sys
 import json
-from typing import List, Set, Dict, Optional
+import fnmatch
+import threading
+from typing import List, Set, Dict, Iterator, Optional
 from clang.cindex import Index, Cursor, CursorKind, TranslationUnit, Config, SourceLocation
 
 
+SOURCE_EXTENSIONS = ('.c', '.cc', '.cpp')
+HEADER_EXTENSIONS = ('.h', '.hh', '.hpp')
+DEFAULT_EXCLUDES: List[str] = ['build/', '.git/']
+
+
+class ProjectScan:
+    """Source files, header files and directories found by one project scan."""
+
+    def __init__(self):
+        self.sources: List[str] = []
+        self.headers: List[str] = []
+        # Every scanned directory, so includes like "autosar/Z.h" resolve from any parent
+        self.include_dirs: List[str] = []
+
+
 class ProjectAnalyzer:
-    def __init__(self, project_root: str):
+    def __init__(self, project_root: str, excludes: Optional[List[str]] = None,
+                 index: Optional[Index] = None, respect_gitignore: bool = False):
         self.project_root: str = project_root
+        # Shared index to parse with, a fresh one per file if None
+        self.index: Optional[Index] = index
+        # Opt-in: generated sources are often git-ignored but still compiled
+        gitignore = self._read_gitignore() if respect_gitignore else []
+        self.excludes: List[str] = DEFAULT_EXCLUDES + gitignore + (excludes or [])
+        self._scan: Optional[ProjectScan] = None
+        self._scan_lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        # Sent to spawned parse workers: the scan goes along, the index and lock cannot
+        state = self.__dict__.copy()
+        state["index"] = None
+        del state["_scan_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._scan_lock = threading.Lock()
+
+    def _read_gitignore(self) -> List[str]:
+        """Read the exclude globs of the project's top-level .gitignore, if any."""
+        try:
+            with open(os.path.join(self.project_root, ".gitignore")) as gitignore:
+                lines = [line.strip() for line in gitignore]
+        except OSError:
+            return []
+        # Negated patterns are not supported and are ignored
+        return [line for line in lines if line and not line.startswith(('#', '!'))]
+
+    def _is_excluded(self, rel_path: str, is_dir: bool) -> bool:
+        """Match a project-relative POSIX path against the gitignore-style exclude globs."""
+        name = rel_path.rsplit('/', 1)[-1]
+        for pattern in self.excludes:
+            if pattern.endswith('/'):
+                if not is_dir:
+                    continue
+                pattern = pattern[:-1]
+            if pattern.startswith('/') or '/' in pattern:
+                if fnmatch.fnmatchcase(rel_path, pattern.lstrip('/')):
+                    return True
+            elif fnmatch.fnmatchcase(name, pattern):
+                return True
+        return False
+
+    def scan(self) -> ProjectScan:
+        """
+        Walk the project once with os.scandir, collecting sources, headers and
+        include directories together. Like os.walk, symlinked directories are not
+        followed. The result is cached for all translation units.
+        """
+        with self._scan_lock:
+            if self._scan is None:
+                scan = ProjectScan()
+                pending = [(self.project_root, '')]
+                while pending:
+                    directory, rel_dir = pending.pop()
+                    try:
+                        entries = os.scandir(directory)
+                    except OSError as error:
+                        kind = "ERROR" if not rel_dir else "WARNING"
+                        print(f"[{kind}] cannot scan {directory}: {error.strerror}", file=sys.stderr)
+                        continue
+                    scan.include_dirs.append(directory)
+                    with entries:
+                        for entry in entries:
+                            rel_path = f"{rel_dir}{entry.name}"
+                            is_dir = entry.is_dir(follow_symlinks=False)
+                            if self._is_excluded(rel_path, is_dir):
+                                continue
+                            if is_dir:
+                                pending.append((entry.path, rel_path + '/'))
+                            elif entry.name.endswith(SOURCE_EXTENSIONS):
+                                scan.sources.append(entry.path)
+                            elif entry.name.endswith(HEADER_EXTENSIONS):
+                                scan.headers.append(entry.path)
+                self._scan = scan
+            return self._scan
 
     def get_source_files(self) -> List[str]:
-        """Collect all C and header files in the project directory."""
-        source_files: List[str] = []
-        for root, dirs, files in os.walk(self.project_root):
-            if "build" in dirs:
-                dirs.remove("build")
-            for file in files:
-                if file.endswith(('.c')):
-                    source_files.append(os.path.join(root, file))
-        return source_files
+        """Collect all C and C++ source files in the project directory."""
+        return list(self.scan().sources)
+
+    def iter_source_files(self) -> Iterator[str]:
+        """Yield the C and C++ source files in the project directory."""
+        yield from self.scan().sources
 
     def get_include_dirs(self) -> List[str]:
-        """Find all directories that might contain header files."""
-        include_dirs: List[str] = []
-        for root, dirs, _ in os.walk(self.project_root):
-            if "build" not in dirs:
-                include_dirs.append(root)
-        return include_dirs
-
-    def get_translation_unit(self, file_path: str) -> Optional[TranslationUnit]:
-        """Parse the given file into a TranslationUnit."""
-        index = Index.create()
-        options = TranslationUnit.PARSE_DETAILED_PROCESSING_RECORD
-        args: List[str] = ['-x', 'c'] + \
-            [f'-I{dir}' for dir in self.get_include_dirs()]
+        """Return every non-excluded directory of the project, root first."""
+        return self.scan().include_dirs
 
-        tu = index.parse(file_path, args=args, options=options)
+    def get_parse_arguments(self, file_path: str) -> List[str]:
+        """Return the compiler arguments used to parse the given file."""
+        language = 'c' if file_path.endswith('.c') else 'c++'
+        return ['-x', language] + [f'-I{dir}' for dir in self.get_include_dirs()]
 
+    @staticmethod
+    def check_diagnostics(tu: TranslationUnit) -> bool:
+        """Report the errors of a parsed file and return whether it parsed cleanly."""
         for diag in tu.diagnostics:
             if diag.severity >= 3:
                 print(
                     f"[ERROR] {diag.location.file}:{diag.location.line} {diag.spelling}", file=sys.stderr)
+        return not tu.diagnostics
 
-        return tu if not tu.diagnostics else None
+    def get_translation_unit(self, file_path: str,
+                             options: int = TranslationUnit.PARSE_DETAILED_PROCESSING_RECORD
+                             ) -> Optional[TranslationUnit]:
+        """Parse the given file into a TranslationUnit."""
+        index = self.index or Index.create()
+        tu = index.parse(file_path, args=self.get_parse_arguments(file_path), options=options)
+        return tu if self.check_diagnostics(tu) else None
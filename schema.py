@@ -0,0 +1,113 @@
+from typing import Iterable, List, Dict, Optional
+from symbols import FunctionInfo
+
+
+SCHEMA_VERSION = 2
+FUNCTION_FIELDS = ("name", "file", "line", "column", "end_line", "usr", "defined")
+
+
+class CompactWriter:
+    """
+    Builder of the compact calltree schema (version 2). Files and functions are
+    tables stored once, functions column by column; edges are [caller, callee]
+    function indexes and call sites are [edge, file, line, column] rows.
+    """
+
+    def __init__(self):
+        self.files: Dict[str, int] = {}
+        self.functions: Dict[str, list] = {field: [] for field in FUNCTION_FIELDS}
+        self.edges: List[List[int]] = []
+        self.sites: List[List[int]] = []
+
+    def file(self, path: str) -> int:
+        return self.files.setdefault(path, len(self.files))
+
+    def function(self, name: str, file: str, line: int, column: int, end_line: int, usr: str, defined: bool) -> int:
+        index = len(self.functions["name"])
+        for field, value in zip(FUNCTION_FIELDS, (name, self.file(file), line, column, end_line, usr, int(defined))):
+            self.functions[field].append(value)
+        return index
+
+    def edge(self, caller: int, callee: int) -> int:
+        self.edges.append([caller, callee])
+        return len(self.edges) - 1
+
+    def site(self, edge: int, file: str, line: int, column: int) -> None:
+        self.sites.append([edge, self.file(file), line, column])
+
+    def as_dict(self) -> dict:
+        return {
+            "version": SCHEMA_VERSION,
+            "files": list(self.files),
+            "functions": self.functions,
+            "edges": self.edges,
+            "sites": self.sites
+        }
+
+
+def compact(calltree: List[dict], unresolved: Iterable[dict] = ()) -> dict:
+    """
+    Convert a version 1 caller list (caller dicts with their callee dicts and sites)
+    to the compact schema. Callee `status` (diff views) and function `size` entries
+    become the per-edge "status" and per-function "sizes" lists.
+    """
+    writer = CompactWriter()
+    indexes: Dict[str, int] = {}
+    sizes: List[float] = []
+    status: List[Optional[str]] = []
+
+    def function(info: dict) -> int:
+        usr = info.get("usr") or info["name"]
+        index = indexes.get(usr)
+        if index is None:
+            index = indexes[usr] = writer.function(info["name"], info["file"], info["line"], info["column"],
+                                                   info.get("end_line", info["line"]), usr, info.get("defined", True))
+            sizes.append(info.get("size", 1))
+        return index
+
+    for caller_dict in calltree:
+        caller = function(caller_dict)
+        for callee_dict in caller_dict["callees"]:
+            edge = writer.edge(caller, function(callee_dict))
+            status.append(callee_dict.get("status"))
+            for site in callee_dict.get("sites", []):
+                file, line, column = site if len(site) == 3 else (caller_dict["file"], *site)
+                writer.site(edge, file, line, column)
+    for info_dict in unresolved:
+        function(info_dict)
+
+    data = writer.as_dict()
+    if any(size != 1 for size in sizes):
+        data["sizes"] = sizes
+    if any(status):
+        data["status"] = status
+    return data
+
+
+def predates_usrs(data: dict) -> bool:
+    """
+    Return whether a version 1 file was saved without USRs. Its functions are then
+    keyed by name, which does not match the USRs of a fresh parse.
+    """
+    if data.get("version", 1) >= SCHEMA_VERSION:
+        return False
+    infos = [info for caller in data["calltree"] for info in [caller] + caller["callees"]]
+    return any("usr" not in info for info in infos + data.get("unresolved", []))
+
+
+def upgrade(data: dict) -> dict:
+    """Return calltree data in the compact schema, converting version 1 files."""
+    if data.get("version", 1) >= SCHEMA_VERSION:
+        return data
+    upgraded = compact(data["calltree"], data.get("unresolved", []))
+    upgraded.update((key, value) for key, value in data.items() if key not in ("calltree", "unresolved"))
+    return upgraded
+
+
+def read_functions(data: dict) -> List[FunctionInfo]:
+    """Rebuild the FunctionInfos of the function table, in index order."""
+    files = data["files"]
+    return [FunctionInfo.from_dict({"name": name, "file": files[file], "line": line, "column": column,
+                                    "end_line": end_line, "usr": usr, "defined": bool(defined)})
+            for name, file, line, column, end_line, usr, defined
+            in zip(*(data["functions"][field] for field in FUNCTION_FIELDS))]
@@ -0,0 +1,66 @@
+from collections import defaultdict
+from typing import List, Dict
+
+
+MAX_PREFIX = 2           # Queries shorter than a trigram are answered from the prefix table
+MAX_PREFIX_POSTINGS = 64  # Entries kept per short prefix, enough to fill the result list
+
+
+def _trigrams(text: str) -> List[str]:
+    return sorted({text[i:i + 3] for i in range(len(text) - 2)})
+
+
+def _deltas(postings: List[int]) -> List[int]:
+    """Delta-encode an ascending posting list so it serializes to small numbers."""
+    return [value - previous for previous, value in zip([0] + postings, postings)]
+
+
+def build(data: dict) -> dict:
+    """
+    Build a prefix and trigram index over the function names and file paths of a
+    calltree dictionary (compact schema), for the search box of the HTML viewer.
+
+    Entries are the functions of the page's edges, identified by their function
+    index, which is also their node ID. Name trigrams point to entries, path
+    trigrams point to files, and files list their entries. Posting lists are sorted
+    and delta-encoded; the viewer intersects them and verifies the candidates.
+    """
+    functions = data["functions"]
+    entries: Dict[int, int] = {}
+    for edge in data["edges"]:
+        for function in edge:
+            entries.setdefault(function, len(entries))
+    names: List[str] = [functions["name"][function] for function in entries]
+    files: Dict[int, int] = {}
+    entry_files: List[int] = [files.setdefault(functions["file"][function], len(files)) for function in entries]
+
+    name_trigrams: Dict[str, List[int]] = defaultdict(list)
+    prefixes: Dict[str, List[int]] = defaultdict(list)
+    for entry, name in enumerate(names):
+        lowered = name.lower()
+        for trigram in _trigrams(lowered):
+            name_trigrams[trigram].append(entry)
+        for length in range(1, MAX_PREFIX + 1):
+            postings = prefixes[lowered[:length]] if len(lowered) >= length else None
+            if postings is not None and len(postings) < MAX_PREFIX_POSTINGS:
+                postings.append(entry)
+
+    file_trigrams: Dict[str, List[int]] = defaultdict(list)
+    file_names = [data["files"][file] for file in files]
+    for file_id, file in enumerate(file_names):
+        for trigram in _trigrams(file.lower()):
+            file_trigrams[trigram].append(file_id)
+    file_entries: List[List[int]] = [[] for _ in files]
+    for entry, file_id in enumerate(entry_files):
+        file_entries[file_id].append(entry)
+
+    return {
+        "ids": list(entries),
+        "names": names,
+        "files": file_names,
+        "entryFiles": entry_files,
+        "fileEntries": [_deltas(postings) for postings in file_entries],
+        "prefixes": {prefix: _deltas(postings) for prefix, postings in prefixes.items()},
+        "nameTrigrams": {trigram: _deltas(postings) for trigram, postings in name_trigrams.items()},
+        "fileTrigrams": {trigram: _deltas(postings) for trigram, postings in file_trigrams.items()}
+    }
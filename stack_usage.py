@@ -0,0 +1,173 @@
+import os
+import re
+import json
+from typing import List, Set, Dict, Iterable, Optional, Tuple
+from call_tree import CallTree
+from symbols import FunctionInfo
+
+
+SU_LINE = re.compile(r'^(?P<file>.*?):(?P<line>\d+):(?P<column>\d+):(?P<name>.+?)\t(?P<bytes>\d+)\t(?P<kind>\S+)')
+
+
+class StackEntry:
+    """One line of a GCC `-fstack-usage` (.su) file."""
+
+    def __init__(self, file: str, line: int, name: str, size: int, kind: str):
+        self.file: str = file
+        self.line: int = line
+        self.name: str = name
+        self.size: int = size
+        self.kind: str = kind  # static, dynamic or dynamic,bounded
+
+
+def read_su_files(paths: Iterable[str]) -> List[StackEntry]:
+    """Read .su files, or every .su file below the given directories."""
+    su_files: List[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                su_files.extend(os.path.join(root, file) for file in files if file.endswith('.su'))
+        else:
+            su_files.append(path)
+
+    entries: List[StackEntry] = []
+    for su_file in su_files:
+        with open(su_file) as su:
+            for line in su:
+                match = SU_LINE.match(line)
+                if match:
+                    # C++ entries carry the full signature, keep the unqualified identifier
+                    name = re.sub(r'\(.*$', '', match['name']).split()[-1].split('::')[-1]
+                    entries.append(StackEntry(match['file'], int(match['line']), name,
+                                              int(match['bytes']), match['kind']))
+    return entries
+
+
+class StackAnalysis:
+    """
+    Worst-case cumulative stack usage over the call graph.
+
+    The worst case of a function is its own frame plus the worst case of its most
+    expensive callee, computed once per function by an iterative depth-first search
+    (linear in functions and edges). Edges closing a cycle are left out of the sum
+    and every function that can reach such an edge is flagged as unbounded. Functions
+    that can reach a frame without .su data or a dynamic frame are flagged the same
+    way, since their worst case is then only a lower bound.
+    """
+
+    def __init__(self, call_tree: CallTree, entries: List[StackEntry]):
+        self.call_tree = call_tree
+        self.frame: Dict[FunctionInfo, int] = {}
+        self.dynamic: Set[FunctionInfo] = set()
+        self.worst: Dict[FunctionInfo, int] = {}
+        self.next_hop: Dict[FunctionInfo, Optional[FunctionInfo]] = {}
+        self.unbounded: Set[FunctionInfo] = set()
+        self.unknown: Set[FunctionInfo] = set()
+        self.reaches_unknown: Set[FunctionInfo] = set()
+        self.reaches_dynamic: Set[FunctionInfo] = set()
+        self.back_edges: List[Tuple[FunctionInfo, FunctionInfo]] = []
+        self._map_entries(entries)
+
+    def _map_entries(self, entries: List[StackEntry]) -> None:
+        """Match .su entries to functions by file name and line, then by unique name."""
+        by_location = {(os.path.basename(info.file), info.line): info
+                       for info in self.call_tree.symbols.definitions()}
+        for entry in entries:
+            info = by_location.get((os.path.basename(entry.file), entry.line))
+            if info is None or info.name != entry.name:
+                candidates = self.call_tree.find(entry.name)
+                info = candidates[0] if len(candidates) == 1 else None
+            if info is None:
+                continue
+            self.frame[info] = entry.size
+            if entry.kind.startswith('dynamic'):
+                self.dynamic.add(info)
+
+    def analyze(self, roots: Iterable[FunctionInfo]) -> None:
+        """Compute the worst case of every function reachable from the roots."""
+        tree = self.call_tree.tree
+        on_stack: Set[FunctionInfo] = set()
+        for root in roots:
+            if root in self.worst:
+                continue
+            on_stack.add(root)
+            stack = [(root, iter(tree.get(root, ())))]
+            while stack:
+                function, callees = stack[-1]
+                callee = next(callees, None)
+                if callee is not None:
+                    if callee in on_stack:
+                        self.back_edges.append((function, callee))
+                        self.unbounded.add(function)
+                    elif callee not in self.worst:
+                        on_stack.add(callee)
+                        stack.append((callee, iter(tree.get(callee, ()))))
+                    continue
+
+                stack.pop()
+                on_stack.discard(function)
+                best, hop = 0, None
+                for callee in tree.get(function, ()):
+                    if callee in self.worst:
+                        if self.worst[callee] > best or hop is None:
+                            best, hop = self.worst[callee], callee
+                        if callee in self.unbounded:
+                            self.unbounded.add(function)
+                        if callee in self.reaches_unknown:
+                            self.reaches_unknown.add(function)
+                        if callee in self.reaches_dynamic:
+                            self.reaches_dynamic.add(function)
+                if function not in self.frame:
+                    self.unknown.add(function)
+                    self.reaches_unknown.add(function)
+                if function in self.dynamic:
+                    self.reaches_dynamic.add(function)
+                self.worst[function] = self.frame.get(function, 0) + best
+                self.next_hop[function] = hop
+
+    def critical_path(self, function: FunctionInfo) -> List[FunctionInfo]:
+        """Return the chain of calls that produces the worst case of the function."""
+        path = [function]
+        while self.next_hop.get(path[-1]) is not None and len(path) <= len(self.worst):
+            path.append(self.next_hop[path[-1]])
+        return path
+
+    def report(self, function: FunctionInfo) -> dict:
+        path = self.critical_path(function)
+        return {
+            "function": function.to_dict(),
+            "worst_case_bytes": self.worst[function],
+            "critical_path": [{"name": info.name, "frame": self.frame.get(info)} for info in path],
+            "unbounded_recursion": function in self.unbounded,
+            "dynamic_frames": [info.name for info in path if info in self.dynamic],
+            "missing_frames": [info.name for info in path if info in self.unknown],
+            "reaches_dynamic_frame": function in self.reaches_dynamic,
+            "reaches_missing_frame": function in self.reaches_unknown
+        }
+
+
+def write_stack_report(call_tree: CallTree, su_paths: List[str], entry_names: List[str]) -> List[dict]:
+    """Compute the worst-case stack of each entry point and save calltree_stack.json."""
+    analysis = StackAnalysis(call_tree, read_su_files(su_paths))
+    roots = call_tree.entry_points(entry_names)
+    analysis.analyze(roots)
+    reports = [analysis.report(root) for root in roots]
+
+    for report in sorted(reports, key=lambda report: -report["worst_case_bytes"]):
+        flags = []
+        if report["unbounded_recursion"]:
+            flags.append("RECURSION")
+        if report["reaches_dynamic_frame"]:
+            flags.append("DYNAMIC")
+        if report["reaches_missing_frame"]:
+            flags.append("MISSING")
+        path = " -> ".join(step["name"] for step in report["critical_path"])
+        print(f"{report['worst_case_bytes']:>8} {report['function']['name']} [{', '.join(flags)}] {path}")
+    for caller, callee in analysis.back_edges:
+        print(f"[WARNING] recursion: {caller.name} -> {callee.name}")
+
+    json_filepath = os.path.join(call_tree.project_root, "calltree_stack.json")
+    with open(json_filepath, "w") as json_file:
+        json.dump({"entry_points": reports}, json_file, indent=4)
+    print(f"Stack report saved at {json_filepath}")
+    return reports
@@ -0,0 +1,148 @@
+import sys
+import json
+from collections import defaultdict
+from typing import Iterable, List, Dict, Optional
+from clang.cindex import Cursor
+
+
+class FunctionInfo:
+    __slots__ = ('name', 'file', 'line', 'column', 'end_line', 'usr', 'is_definition', 'id')
+
+    def __init__(self, cursor: Cursor):
+        if hasattr(cursor, 'spelling'):
+            self.name: str = cursor.spelling
+            self.file: str = sys.intern(cursor.location.file.name)
+            self.line: int = cursor.location.line
+            self.column: int = cursor.location.column
+            self.end_line: int = cursor.extent.end.line
+            self.usr: str = cursor.get_usr() or self.name
+            self.is_definition: bool = cursor.is_definition()
+            self.id: Optional[int] = None
+        else:
+            self.name: str = cursor.name
+            self.file: str = cursor.file
+            self.line: int = cursor.line
+            self.column: int = cursor.column
+            self.end_line: int = getattr(cursor, 'end_line', self.line)
+            self.usr: str = getattr(cursor, 'usr', None) or self.name
+            self.is_definition: bool = getattr(cursor, 'is_definition', True)
+            self.id: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FunctionInfo":
+        """Rebuild a FunctionInfo from the dictionary produced by `to_dict`."""
+        info = cls.__new__(cls)
+        info.name = data["name"]
+        info.file = sys.intern(data["file"])
+        info.line = data["line"]
+        info.column = data["column"]
+        info.end_line = data.get("end_line", info.line)
+        info.usr = data.get("usr") or info.name
+        info.is_definition = data.get("defined", True)
+        info.id = None
+        return info
+
+    def relocate(self, other: "FunctionInfo") -> None:
+        """Move this function to the location of `other`, typically its definition."""
+        self.file = other.file
+        self.line = other.line
+        self.column = other.column
+        self.end_line = other.end_line
+        self.is_definition = other.is_definition
+
+    def __repr__(self) -> str:
+        return f"{self.name} {self.file}:{self.line}:{self.column}"
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, FunctionInfo) and self.usr == other.usr
+
+    def __hash__(self) -> int:
+        return hash(self.usr)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "file": self.file,
+            "line": self.line,
+            "column": self.column,
+            "end_line": self.end_line,
+            "usr": self.usr,
+            "defined": self.is_definition
+        }
+
+    def json(self) -> str:
+        return json.dumps(self.to_dict(), indent=4)
+
+
+class SymbolTable:
+    """
+    Project-wide table of functions keyed by USR.
+
+    Every declaration of a function resolves to the same FunctionInfo, which is moved
+    to the definition as soon as one is seen in any translation unit. Functions that
+    are only ever declared are kept in `externals`.
+    """
+
+    def __init__(self):
+        self.symbols: Dict[str, FunctionInfo] = {}
+        self.functions: List[FunctionInfo] = []
+        self.externals: Dict[str, FunctionInfo] = {}
+        self.by_name: Dict[str, List[FunctionInfo]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __contains__(self, usr: str) -> bool:
+        return usr in self.symbols
+
+    def intern(self, cursor) -> FunctionInfo:
+        """Return the unique FunctionInfo for a cursor or FunctionInfo, registering it if new."""
+        info = cursor if isinstance(cursor, FunctionInfo) else FunctionInfo(cursor)
+        known = self.symbols.get(info.usr)
+        if known is None:
+            info.id = len(self.functions)
+            self.functions.append(info)
+            self.symbols[info.usr] = info
+            self.by_name[info.name].append(info)
+            if not info.is_definition:
+                self.externals[info.usr] = info
+            return info
+        if info.is_definition and not known.is_definition:
+            known.relocate(info)
+            del self.externals[known.usr]
+        return known
+
+    def remove(self, infos: Iterable[FunctionInfo]) -> Dict[int, int]:
+        """Drop functions from the table and renumber the rest, returning the old to new ID map."""
+        for info in infos:
+            del self.symbols[info.usr]
+            self.externals.pop(info.usr, None)
+            self.by_name[info.name].remove(info)
+            if not self.by_name[info.name]:
+                del self.by_name[info.name]
+        self.functions = [info for info in self.functions if info.usr in self.symbols]
+        renumber: Dict[int, int] = {}
+        for function_id, info in enumerate(self.functions):
+            renumber[info.id] = function_id
+            info.id = function_id
+        return renumber
+
+    def get(self, usr: str) -> Optional[FunctionInfo]:
+        """Return the function with the given USR, if known."""
+        return self.symbols.get(usr)
+
+    def by_id(self, function_id: int) -> FunctionInfo:
+        """Return the function with the given integer ID."""
+        return self.functions[function_id]
+
+    def lookup(self, name: str) -> List[FunctionInfo]:
+        """Return all functions with the given name (several for file-static functions)."""
+        return self.by_name.get(name, [])
+
+    def definitions(self) -> List[FunctionInfo]:
+        """Return all functions that have a definition in the project."""
+        return [info for info in self.symbols.values() if info.is_definition]
+
+    def unresolved(self) -> List[FunctionInfo]:
+        """Return all functions that are declared but never defined in the project."""
+        return list(self.externals.values())
@@ -1,4 +1,12 @@
+import gzip
+import json
+import base64
+from typing import Optional
+import search_index
+
 JSON_REPLACE_HINT = r"JSON_DATA_TO_REPLACE"
+LINKS_REPLACE_HINT = r"PAGE_LINKS_TO_REPLACE"
+SEARCH_REPLACE_HINT = r"SEARCH_INDEX_TO_REPLACE"
 HTML_TEMPLATE = r"""<!DOCTYPE html>
 <html lang="en">
 
@@ -56,16 +64,65 @@ HTML_TEMPLATE = r"""<!DOCTYPE html>
         .vis-network .vis-arrow {
             fill: #ff4444;
         }
+
+        #search {
+            position: absolute;
+            top: 10px;
+            left: 10px;
+            z-index: 10;
+            width: 360px;
+        }
+
+        #search-input {
+            width: 100%;
+            padding: 6px;
+            box-sizing: border-box;
+        }
+
+        #search-results {
+            margin: 0;
+            padding: 0;
+            list-style: none;
+            max-height: 60vh;
+            overflow-y: auto;
+            background-color: white;
+        }
+
+        #search-results li {
+            padding: 4px 6px;
+            cursor: pointer;
+            white-space: nowrap;
+            overflow: hidden;
+            text-overflow: ellipsis;
+        }
+
+        #search-results li:hover {
+            background-color: #d1e8ff;
+        }
     </style>
     <script type="text/javascript" src="https://unpkg.com/vis-network/standalone/umd/vis-network.min.js"></script>
 </head>
 
 <body>
+    <div id="search">
+        <input id="search-input" type="search" placeholder="Search functions or files..." autocomplete="off">
+        <ul id="search-results"></ul>
+    </div>
     <div id="graph-container"></div>
-    <script>
+    <script type="module">
+
+        // Decode call tree data embedded as base64-encoded gzip
+        async function inflate(base64) {
+            const bytes = Uint8Array.from(atob(base64), c => c.charCodeAt(0));
+            const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+            return JSON.parse(await new Response(stream).text());
+        }
+
+        // Sample JSON data (your provided data), either inline or compressed
+        const jsonData = await (JSON_DATA_TO_REPLACE);
 
-        // Sample JSON data (your provided data)
-        const jsonData = JSON_DATA_TO_REPLACE;
+        // Pages of other shards, by "file:name" for functions or by base name for modules
+        const pageLinks = PAGE_LINKS_TO_REPLACE;
 
         
         
@@ -73,13 +130,15 @@ HTML_TEMPLATE = r"""<!DOCTYPE html>
         let nodes = new vis.DataSet();
         let edges = new vis.DataSet();
         const moduleNodes = {}; // To track module nodes for grouping
+        const edgeColors = { added: '#2e9e44', removed: '#999999' };
 
-        // Group functions by module (combine .c and .h with same base name)
-        jsonData.calltree.forEach(caller => {
-            const filePath = caller.file;
-            const baseName = filePath.split('\\').pop().split('.')[0]; // Get base name (e.g., "hello" from "hello.h" or "hello.c")
+        // Compact schema: function and file tables, edges as [caller, callee] function indexes
+        const functions = jsonData.functions;
+        const files = jsonData.files;
+        const addedFunctions = new Set();
 
-            // Ensure module node exists (combine .c and .h)
+        // Ensure the module node exists (combine .c and .h with same base name, e.g. "hello")
+        const addModule = baseName => {
             if (!moduleNodes[baseName]) {
                 const moduleId = `module_${baseName}`;
                 moduleNodes[baseName] = moduleId;
@@ -93,76 +152,45 @@ HTML_TEMPLATE = r"""<!DOCTYPE html>
                     size: 50
                 });
             }
+            return moduleNodes[baseName];
+        };
 
-            // Create unique ID for caller function using full file path to avoid duplicates
-            const callerUniqueId = `func_${filePath.replace(/\\/g, '_').replace(/\./g, '_')}_${caller.name}`;
-            if (!nodes.get(callerUniqueId)) { // Check if node already exists
-                nodes.add({
-                    id: callerUniqueId,
-                    label: `[F] ${caller.name}`,
-                    group: 'function',
-                    shape: 'box',
-                    color: { background: '#97dad2', border: '#4a90e2', highlight: { background: '#d1e8ff', border: '#4a90e2' } },
-                    font: { size: 12 },
-                    size: 50,
-                    parent: moduleNodes[baseName] // Link to module
-                });
-            }
-
-            // Link module to function (only if not already linked)
-            if (!edges.get().some(edge => edge.from === moduleNodes[baseName] && edge.to === callerUniqueId)) {
-                edges.add({ from: moduleNodes[baseName], to: callerUniqueId, arrows: 'to', color: { color: '#888888' }, smooth: true });
-            }
-
-            // Handle callees
-            caller.callees.forEach(callee => {
-                const calleeFilePath = callee.file;
-                const calleeBaseName = calleeFilePath.split('\\').pop().split('.')[0];
-
-                // Ensure callee module exists
-                if (!moduleNodes[calleeBaseName]) {
-                    const moduleId = `module_${calleeBaseName}`;
-                    moduleNodes[calleeBaseName] = moduleId;
-                    nodes.add({
-                        id: moduleId,
-                        label: `[M] ${calleeBaseName}`,
-                        group: 'module',
-                        shape: 'box',
-                        color: { background: '#cce253', border: '#4a90e2', highlight: { border: '#4a90e2' } },
-                        font: { size: 12, color: '#333' },
-                        size: 50
-                    });
-                }
-
-                // Create unique ID for callee function
-                const calleeUniqueId = `func_${calleeFilePath.replace(/\\/g, '_').replace(/\./g, '_')}_${callee.name}`;
-                if (!nodes.get(calleeUniqueId)) { // Check if node already exists
-                    nodes.add({
-                        id: calleeUniqueId,
-                        label: `[F] ${callee.name}`,
-                        group: 'function',
-                        shape: 'box',
-                        color: { background: '#97dad2', border: '#4a90e2', highlight: { background: '#d1e8ff', border: '#4a90e2' } },
-                        font: { size: 12 },
-                        size: 50,
-                        parent: moduleNodes[calleeBaseName] // Link to module
-                    });
-                }
+        // Function nodes use their function index as ID, linked once to their module
+        const addFunction = index => {
+            if (addedFunctions.has(index)) return;
+            addedFunctions.add(index);
+            const filePath = files[functions.file[index]];
+            const name = functions.name[index];
+            const baseName = filePath.split(/[\\/]/).pop().split('.')[0];
+            const moduleId = addModule(baseName);
+            nodes.add({
+                id: index,
+                label: `[F] ${name}`,
+                group: 'function',
+                shape: 'box',
+                color: { background: '#97dad2', border: '#4a90e2', highlight: { background: '#d1e8ff', border: '#4a90e2' } },
+                font: { size: 12 * (jsonData.sizes ? jsonData.sizes[index] : 1) }, // Scaled by a metric when exported with --metrics
+                size: 50,
+                parent: moduleId, // Link to module
+                link: pageLinks[`${filePath}:${name}`] || pageLinks[baseName]
+            });
+            edges.add({ from: moduleId, to: index, arrows: 'to', color: { color: '#888888' }, smooth: true });
+        };
 
-                // Link callee module to function (only if not already linked)
-                if (!edges.get().some(edge => edge.from === moduleNodes[calleeBaseName] && edge.to === calleeUniqueId)) {
-                    edges.add({ from: moduleNodes[calleeBaseName], to: calleeUniqueId, arrows: 'to', color: { color: '#888888' }, smooth: true });
-                }
+        jsonData.edges.forEach(([caller, callee], edge) => {
+            addFunction(caller);
+            addFunction(callee);
 
-                // Add caller -> callee edge
-                edges.add({
-                    from: callerUniqueId,
-                    to: calleeUniqueId,
-                    arrows: 'to',
-                    color: { color: '#ff4444' },
-                    smooth: { type: 'curvedCW', roundness: 0.5 }, // Curved arrow
-                    width: 2
-                });
+            // Add caller -> callee edge (diff views mark edges as added or removed)
+            const status = jsonData.status ? jsonData.status[edge] : null;
+            edges.add({
+                from: caller,
+                to: callee,
+                arrows: 'to',
+                color: { color: edgeColors[status] || '#ff4444' },
+                dashes: status === 'removed',
+                smooth: { type: 'curvedCW', roundness: 0.5 }, // Curved arrow
+                width: 2
             });
         });
 
@@ -212,7 +240,90 @@ HTML_TEMPLATE = r"""<!DOCTYPE html>
                 }
             }
         };
-        new vis.Network(container, data, options);
+        const network = new vis.Network(container, data, options);
+
+        // Search-as-you-type over the index built at export time, without scanning the DataSet
+        const searchIndex = await (SEARCH_INDEX_TO_REPLACE);
+        if (searchIndex) {
+            const decode = deltas => { let value = 0; return deltas.map(delta => value += delta); };
+            const decodeTable = table => {
+                const decoded = {};
+                for (const key in table) decoded[key] = decode(table[key]);
+                return decoded;
+            };
+            const prefixes = decodeTable(searchIndex.prefixes);
+            const nameTrigrams = decodeTable(searchIndex.nameTrigrams);
+            const fileTrigrams = decodeTable(searchIndex.fileTrigrams);
+            const fileEntries = searchIndex.fileEntries.map(decode);
+            const lowerNames = searchIndex.names.map(name => name.toLowerCase());
+            const lowerFiles = searchIndex.files.map(file => file.toLowerCase());
+
+            const lowerBound = (list, value) => {
+                let lo = 0, hi = list.length;
+                while (lo < hi) {
+                    const mid = (lo + hi) >> 1;
+                    if (list[mid] < value) lo = mid + 1; else hi = mid;
+                }
+                return lo;
+            };
+            // Intersect sorted posting lists, probing the longer lists by binary search
+            const intersect = lists => {
+                lists.sort((a, b) => a.length - b.length);
+                return lists.slice(1).reduce(
+                    (found, list) => found.filter(value => list[lowerBound(list, value)] === value), lists[0]);
+            };
+            const lookup = (table, query) => {
+                const trigrams = new Set();
+                for (let i = 0; i + 3 <= query.length; i++) trigrams.add(query.slice(i, i + 3));
+                return intersect([...trigrams].map(trigram => table[trigram] || []));
+            };
+
+            const search = (text, limit = 50) => {
+                const query = text.toLowerCase();
+                if (!query) return [];
+                if (query.length < 3) return (prefixes[query] || []).slice(0, limit);
+                const found = new Set();
+                for (const entry of lookup(nameTrigrams, query)) {
+                    if (lowerNames[entry].includes(query) && found.add(entry).size >= limit) return [...found];
+                }
+                for (const file of lookup(fileTrigrams, query)) {
+                    if (!lowerFiles[file].includes(query)) continue;
+                    for (const entry of fileEntries[file]) {
+                        if (found.add(entry).size >= limit) return [...found];
+                    }
+                }
+                return [...found];
+            };
+
+            const focusNode = id => {
+                network.selectNodes([id]);
+                network.focus(id, { scale: 1.5, animation: true });
+            };
+            const input = document.getElementById('search-input');
+            const results = document.getElementById('search-results');
+            input.addEventListener('input', () => {
+                results.innerHTML = '';
+                for (const entry of search(input.value)) {
+                    const item = document.createElement('li');
+                    item.textContent = `${searchIndex.names[entry]} - ${searchIndex.files[searchIndex.entryFiles[entry]]}`;
+                    item.addEventListener('click', () => focusNode(searchIndex.ids[entry]));
+                    results.appendChild(item);
+                }
+            });
+            input.addEventListener('keydown', event => {
+                if (event.key === 'Enter' && results.firstChild) results.firstChild.click();
+            });
+        } else {
+            document.getElementById('search').style.display = 'none';
+        }
+
+        // Double-click a function shown on another shard page to open that page
+        network.on('doubleClick', params => {
+            const node = params.nodes.length ? nodes.get(params.nodes[0]) : null;
+            if (node && node.link) {
+                window.location.href = node.link;
+            }
+        });
 
 
 
@@ -220,4 +331,56 @@ HTML_TEMPLATE = r"""<!DOCTYPE html>
 </body>
 
 </html>
-"""
\ No newline at end of file
+"""
+
+INDEX_TEMPLATE = r"""<!DOCTYPE html>
+<html lang="en">
+
+<head>
+    <meta charset="UTF-8">
+    <title>Calltree Index</title>
+    <style>
+        body {
+            margin: 20px;
+            font-family: Arial, sans-serif;
+            background-color: #f0f0f0;
+        }
+
+        li {
+            margin: 4px 0;
+        }
+    </style>
+</head>
+
+<body>
+    <h1>Calltree Index</h1>
+    <ul>
+PAGE_LIST_TO_REPLACE
+    </ul>
+</body>
+
+</html>
+"""
+PAGE_LIST_REPLACE_HINT = r"PAGE_LIST_TO_REPLACE"
+
+
+def _embed(data: object, compress: bool, indent: Optional[int] = None) -> str:
+    """Return a JavaScript expression for the data, inline or as base64 gzip to `inflate`."""
+    if not compress:
+        return json.dumps(data, indent=indent)
+    payload = base64.b64encode(gzip.compress(json.dumps(data, separators=(',', ':')).encode(), mtime=0))
+    return f'inflate("{payload.decode()}")'
+
+
+def render_html(data: dict, page_links: Optional[dict] = None, compress: bool = False,
+                search: bool = True) -> str:
+    """
+    Fill the viewer template with calltree data, the links to other shard pages
+    and a search index over the functions. With `compress`, the data is embedded
+    gzip-compressed and base64-encoded and is inflated by the browser's
+    DecompressionStream.
+    """
+    return HTML_TEMPLATE \
+        .replace(LINKS_REPLACE_HINT, json.dumps(page_links or {})) \
+        .replace(SEARCH_REPLACE_HINT, _embed(search_index.build(data), compress) if search else "null") \
+        .replace(JSON_REPLACE_HINT, _embed(data, compress))
@@ -0,0 +1,166 @@
+import re
+import copy
+from collections import Counter, defaultdict
+from typing import List, Dict, Optional, Set, Tuple
+from clang.cindex import Index, TranslationUnit
+from call_tree import CallTree, UnitRecords
+from project import ProjectAnalyzer
+
+
+IDENTIFIER = re.compile(r'[A-Za-z_]\w*')
+
+
+class Variant:
+    """A named set of preprocessor definitions, e.g. `debug:DEBUG,LEVEL=2`."""
+
+    def __init__(self, spec: str):
+        self.name, _, defines = spec.partition(':')
+        self.defines: Dict[str, str] = {}
+        for define in filter(None, defines.split(',')):
+            macro, _, value = define.partition('=')
+            self.defines[macro] = value or '1'
+
+    @property
+    def arguments(self) -> List[str]:
+        return [f'-D{macro}={value}' for macro, value in self.defines.items()]
+
+    def signature(self, macros: Set[str]) -> Tuple[Optional[str], ...]:
+        """Return the values of the given macros, which decide how a file preprocesses."""
+        return tuple(self.defines.get(macro) for macro in sorted(macros))
+
+
+class VariantCallTree(CallTree):
+    """
+    Union of the call graphs of several variants. Every edge and function carries a
+    bitmask of the variants it appears in (bit i for `variants[i]`).
+    """
+
+    def __init__(self, project_root: str, variants: List[Variant]):
+        super().__init__(project_root)
+        self.variants: List[Variant] = variants
+        self.edge_variants: Dict[Tuple[int, int], int] = defaultdict(int)
+        self.function_variants: Dict[int, int] = defaultdict(int)
+
+    def merge_variants(self, records: UnitRecords, mask: int, unit_sites: Counter) -> None:
+        """
+        Add the records of one parse, shared by the variants in `mask`. The call sites
+        are counted into `unit_sites`, keeping for each the most times any parse of the
+        translation unit has it, to be merged once all parses are done.
+        """
+        for info in records.definitions:
+            self.function_variants[self.symbols.intern(info).id] |= mask
+
+        parse_sites: Counter = Counter()
+        for caller, callee, file, line, column in records.calls:
+            caller_info = self.symbols.intern(caller)
+            callee_info = self.symbols.intern(callee)
+            self.tree[caller_info].add(callee_info)
+            self.edge_variants[(caller_info.id, callee_info.id)] |= mask
+            self.function_variants[caller_info.id] |= mask
+            self.function_variants[callee_info.id] |= mask
+            parse_sites[(caller_info.id, callee_info.id, file, line, column)] += 1
+        unit_sites |= parse_sites
+
+    def variant_names(self, mask: int) -> List[str]:
+        return [variant.name for bit, variant in enumerate(self.variants) if mask >> bit & 1]
+
+    def as_dict(self) -> dict:
+        """
+        Add the variants to the union graph: the variant list, and the bitmask of
+        variants of every function and every edge, in table order.
+        """
+        data = super().as_dict()
+        data["variants"] = [{"name": variant.name, "defines": variant.defines} for variant in self.variants]
+        data["function_variants"] = [self.function_variants[info.id] for info in self.symbols.functions]
+        data["edge_variants"] = [self.edge_variants[(caller, callee)] for caller, callee in data["edges"]]
+        return data
+
+    def view(self, name: str) -> CallTree:
+        """Return the graph of one variant by filtering the union graph."""
+        bit = 1 << next(i for i, variant in enumerate(self.variants) if variant.name == name)
+        view = CallTree(self.project_root)
+        for info in self.symbols.functions:
+            if self.function_variants[info.id] & bit:
+                view.symbols.intern(copy.copy(info))
+        for caller, callees in self.tree.items():
+            for callee in callees:
+                if self.edge_variants[(caller.id, callee.id)] & bit:
+                    view.tree[view.symbols.get(caller.usr)].add(view.symbols.get(callee.usr))
+        for caller_id, callee_id, file, line, column in self.sites.sites():
+            if self.edge_variants[(caller_id, callee_id)] & bit:
+                caller = view.symbols.get(self.symbols.by_id(caller_id).usr)
+                callee = view.symbols.get(self.symbols.by_id(callee_id).usr)
+                view.sites.add(caller.id, callee.id, file, line, column)
+        return view
+
+
+class VariantAnalyzer:
+    """
+    Build the union graph of several variants, parsing each translation unit only
+    once per distinct preprocessing.
+
+    After a parse, the identifiers of the main file and every file it included are
+    intersected with the variant macros. Variants that agree on all of those macros
+    preprocess the unit identically (same conditionals, same includes, same
+    expansions), so the parse is shared by all of them; the remaining variants are
+    parsed in turn the same way.
+    """
+
+    def __init__(self, analyzer: ProjectAnalyzer, variants: List[Variant]):
+        self.analyzer = analyzer
+        self.variants: List[Variant] = variants
+        self.macros: Set[str] = {macro for variant in variants for macro in variant.defines}
+        self.index: Index = Index.create()
+        self.call_tree = VariantCallTree(analyzer.project_root, variants)
+        self.parses: int = 0
+        self._identifiers: Dict[str, Set[str]] = {}
+
+    def _macros_used(self, tu: TranslationUnit) -> Set[str]:
+        """Return the variant macros named anywhere in the files of a translation unit."""
+        files = {tu.spelling} | {inclusion.include.name for inclusion in tu.get_includes()}
+        used: Set[str] = set()
+        for file in files:
+            identifiers = self._identifiers.get(file)
+            if identifiers is None:
+                with open(file, encoding='utf-8', errors='replace') as source:
+                    identifiers = self.macros.intersection(IDENTIFIER.findall(source.read()))
+                self._identifiers[file] = identifiers
+            used |= identifiers
+        return used
+
+    def _parse(self, source_file: str, variant: Variant) -> Optional[TranslationUnit]:
+        self.parses += 1
+        tu = self.index.parse(source_file, args=self.analyzer.get_parse_arguments(source_file) + variant.arguments,
+                              options=TranslationUnit.PARSE_DETAILED_PROCESSING_RECORD)
+        return tu if self.analyzer.check_diagnostics(tu) else None
+
+    def build_unit(self, source_file: str) -> None:
+        """Parse one source file for every distinct preprocessing among the variants."""
+        remaining = list(range(len(self.variants)))
+        unit_sites: Counter = Counter()
+        includes: Set[Tuple[str, str]] = set()
+        while remaining:
+            representative = self.variants[remaining[0]]
+            tu = self._parse(source_file, representative)
+            if tu is None:
+                # Without a parse the shared macros are unknown, the other variants get their own
+                remaining.pop(0)
+                continue
+            used = self._macros_used(tu)
+            signature = representative.signature(used)
+            shared = [i for i in remaining if self.variants[i].signature(used) == signature]
+            remaining = [i for i in remaining if i not in shared]
+
+            records = self.call_tree.extract(tu)
+            self.call_tree.merge_variants(records, sum(1 << i for i in shared), unit_sites)
+            includes.update(records.includes)
+        self.call_tree.merge_sites(source_file, unit_sites)
+        # The include graph holds the union of what any variant includes
+        self.call_tree.includes.record(source_file, sorted(includes))
+
+    def build(self) -> VariantCallTree:
+        source_files = self.analyzer.get_source_files()
+        for source_file in source_files:
+            self.build_unit(source_file)
+        print(f"{len(source_files)} files x {len(self.variants)} variants analyzed with {self.parses} parses")
+        return self.call_tree
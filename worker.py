@@ -0,0 +1,198 @@
+import os
+import io
+import sys
+import hmac
+import json
+import runpy
+import socket
+import secrets
+import contextlib
+from typing import List, Dict, Optional, Tuple
+
+
+HOST = "127.0.0.1"
+DEFAULT_PORT = int(os.environ.get("CALLTREE_PORT", 47391))
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "__main__.py")
+
+
+def token_path(port: int) -> str:
+    """Return the file holding the worker's token, in the user's home so only they can read it."""
+    return os.path.join(os.path.expanduser("~"), f".calltree_worker_{port}")
+
+# The resident worker while a request is being served in it, None in a normal run
+WORKER: Optional["Worker"] = None
+
+
+class _Channel(io.TextIOBase):
+    """Text stream that sends everything written to it back to the client."""
+
+    def __init__(self, connection: socket.socket, stream: str):
+        self.connection = connection
+        self.stream = stream
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if text:
+            self.connection.sendall((json.dumps({self.stream: text}) + "\n").encode())
+        return len(text)
+
+
+class ProjectCache:
+    """
+    Extraction records of one project's translation units, kept between requests.
+    A unit is parsed again only when its source or one of its headers changed.
+    """
+
+    def __init__(self):
+        self.units: Dict[str, Tuple[Dict[str, int], object]] = {}
+
+    @staticmethod
+    def _stamps(tu) -> Dict[str, int]:
+        files = {tu.spelling} | {inclusion.include.name for inclusion in tu.get_includes()}
+        return {file: os.stat(file).st_mtime_ns for file in files}
+
+    def build(self, analyzer, call_tree) -> int:
+        """Merge every unit into the call tree, re-parsing only stale ones. Returns the parse count."""
+        mtimes: Dict[str, Optional[int]] = {}
+
+        def mtime(file: str) -> Optional[int]:
+            if file not in mtimes:
+                try:
+                    mtimes[file] = os.stat(file).st_mtime_ns
+                except OSError:
+                    mtimes[file] = None
+            return mtimes[file]
+
+        parses = 0
+        source_files = analyzer.get_source_files()
+        for source_file in source_files:
+            cached = self.units.get(source_file)
+            if cached is None or any(mtime(file) != stamp for file, stamp in cached[0].items()):
+                parses += 1
+                tu = analyzer.get_translation_unit(source_file)
+                if not tu:
+                    self.units.pop(source_file, None)
+                    continue
+                cached = self.units[source_file] = (self._stamps(tu), call_tree.extract(tu))
+            call_tree.merge(cached[1].copy())
+        for source_file in set(self.units) - set(source_files):
+            del self.units[source_file]
+        return parses
+
+
+class Worker:
+    """
+    Resident analysis process listening on a localhost socket.
+
+    Each request carries the command line arguments and working directory of a
+    client invocation; the worker runs __main__ with them in-process, streams its
+    output back and reports the exit status. Requests must present the random token
+    the worker writes to `token_path(port)`, readable by the user who started it only,
+    since any local user can connect to the port. libclang stays loaded and the parsed
+    records of every project are reused by later requests.
+    """
+
+    def __init__(self, port: int = DEFAULT_PORT):
+        self.port = port
+        self.projects: Dict[tuple, ProjectCache] = {}
+        self.token: str = secrets.token_hex(32)
+
+    def build(self, analyzer, call_tree) -> None:
+        key = (os.path.abspath(analyzer.project_root), tuple(analyzer.excludes), frozenset(call_tree.library_usrs))
+        cache = self.projects.setdefault(key, ProjectCache())
+        parses = cache.build(analyzer, call_tree)
+        print(f"[WORKER] {parses} of {len(cache.units)} translation units parsed", file=sys.stderr)
+
+    def _run(self, argv: List[str], cwd: str) -> int:
+        global WORKER
+        previous_cwd, previous_argv = os.getcwd(), sys.argv
+        os.chdir(cwd)
+        sys.argv = [MAIN] + argv
+        WORKER = self
+        try:
+            runpy.run_path(MAIN, run_name="__main__")
+            return 0
+        except SystemExit as exit:
+            return exit.code if isinstance(exit.code, int) else (0 if exit.code is None else 1)
+        finally:
+            WORKER = None
+            sys.argv = previous_argv
+            os.chdir(previous_cwd)
+
+    def handle(self, connection: socket.socket) -> None:
+        with connection, connection.makefile("r", encoding="utf-8") as requests:
+            try:
+                request = json.loads(requests.readline())
+                token = str(request.get("token", "")).encode("utf-8")
+                authorized = hmac.compare_digest(token, self.token.encode("utf-8"))
+                argv, cwd = request["argv"], request["cwd"]
+                if not isinstance(cwd, str) or not all(isinstance(arg, str) for arg in argv):
+                    raise TypeError("argv must be a list of strings and cwd a string")
+            except (ValueError, TypeError, AttributeError, KeyError) as error:
+                print(f"[WARNING] rejected a malformed request: {error}", file=sys.stderr)
+                connection.sendall((json.dumps({"error": "malformed request"}) + "\n").encode())
+                return
+            if not authorized:
+                print("[WARNING] rejected a request without the worker token", file=sys.stderr)
+                connection.sendall((json.dumps({"denied": True}) + "\n").encode())
+                return
+            out, err = _Channel(connection, "out"), _Channel(connection, "err")
+            with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+                try:
+                    status = self._run(argv, cwd)
+                except Exception as error:
+                    print(f"[ERROR] {type(error).__name__}: {error}", file=sys.stderr)
+                    status = 1
+            connection.sendall((json.dumps({"status": status}) + "\n").encode())
+
+    def serve(self) -> None:
+        """Serve requests one at a time until interrupted."""
+        with socket.create_server((HOST, self.port)) as server:
+            path = token_path(self.port)
+            if os.path.exists(path):
+                os.remove(path)
+            with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "w") as token_file:
+                token_file.write(self.token)
+            print(f"[WORKER] Listening on {HOST}:{self.port}")
+            try:
+                while True:
+                    connection, _ = server.accept()
+                    try:
+                        self.handle(connection)
+                    except OSError as error:
+                        print(f"[WARNING] client disconnected: {error}", file=sys.stderr)
+                    except Exception as error:
+                        # One bad client must not stop the worker
+                        print(f"[ERROR] request failed: {type(error).__name__}: {error}", file=sys.stderr)
+            finally:
+                os.remove(path)
+
+
+def forward(argv: List[str], port: int = DEFAULT_PORT) -> Optional[int]:
+    """
+    Run the command in a resident worker if one is listening, printing its output.
+    Returns the exit status, or None when no worker of this user is running.
+    """
+    try:
+        with open(token_path(port)) as token_file:
+            token = token_file.read().strip()
+        connection = socket.create_connection((HOST, port), timeout=0.2)
+    except OSError:
+        return None
+    with connection, connection.makefile("r", encoding="utf-8") as replies:
+        connection.settimeout(None)
+        connection.sendall((json.dumps({"argv": argv, "cwd": os.getcwd(), "token": token}) + "\n").encode())
+        for line in replies:
+            reply = json.loads(line)
+            if "denied" in reply or "error" in reply:
+                print("[WARNING] worker rejected the request, running in-process", file=sys.stderr)
+                return None
+            if "status" in reply:
+                return reply["status"]
+            stream = sys.stdout if "out" in reply else sys.stderr
+            stream.write(reply.get("out") or reply.get("err"))
+            stream.flush()
+    print("[WARNING] worker closed the connection, running in-process", file=sys.stderr)
+    return None